@@ -1,167 +1,365 @@
-import pydot
-from bson.objectid import ObjectId
-import random
-import traceback
+import argparse
+import logging
+import os
+import sys
+from sampling import DEFAULT_MAX_DEPTH, DEFAULT_MAX_WIDTH, DEFAULT_SAMPLE_SIZE, SAMPLING_STRATEGIES
+from profiling import EXECUTORS, collect_profiles
+from containment import DEFAULT_MIN_CONFIDENCE, find_value_references
+from cardinality import assign_cardinalities, collapse_join_collections
+from rendering import RENDER_BACKENDS, RENDER_FORMATS, content_addressed_basename, get_backend, output_paths, parallel_backend, render_dot, render_many
+from naming import DEFAULT_ALIASES, CollectionNameIndex, normalize_name, split_reference_field
+from instrumentation import NULL_METRICS, Metrics, configure_logging, profiled
+from schema_graph import SchemaGraph
+from snapshot import save_snapshot
+from field_stats import export_field_stats
+from index_advisor import advise_indexes, read_index_catalog
+from clustering import CLUSTER_METHODS, DEFAULT_MAX_CLUSTER_SIZE, ego_graph, find_clusters, overview_graph
 
-def detect_relationships(db_data):
+logger = logging.getLogger("grafos")
+
+RELATIONSHIP_MODES = ("name", "value", "both")
+
+def detect_relationships(db_data, profiles=None, sample_size=DEFAULT_SAMPLE_SIZE, sampling="first", name_index=None, aliases=None, mode="name", min_confidence=DEFAULT_MIN_CONFIDENCE, cardinality=True, executor="auto", max_workers=None, cache=None, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, metrics=NULL_METRICS):
+    if mode not in RELATIONSHIP_MODES:
+        raise ValueError(f"Modo de detección desconocido: '{mode}' (opciones: {RELATIONSHIP_MODES})")
     detected_relationships = set()
-    collection_names = list(db_data.keys())
-    print("\n--- Iniciando detección automática de relaciones ---")
-    for source_collection_name, collection_data in db_data.items():
-        if not collection_data:
-            print(f"Colección '{source_collection_name}' está vacía, saltando...")
-            continue
-        first_doc = collection_data[0]
-        print(f"Analizando campos del primer documento en '{source_collection_name}': {list(first_doc.keys())}")
-        for field_name, field_value in first_doc.items():
-            if field_name.endswith("_id") and field_name != "_id" and isinstance(field_value, ObjectId):
-                print(f"  > Campo encontrado '{field_name}' en '{source_collection_name}' que parece una clave foránea.")
-                base_name = field_name[:-3]
-                potential_target_names = [base_name, base_name + 's']
-                target_collection_name_found = None
-                for potential_target in potential_target_names:
-                    if potential_target in collection_names:
-                        if potential_target != source_collection_name:
-                             target_collection_name_found = potential_target
-                             print(f"    >> Posible referencia a la colección: '{target_collection_name_found}'")
-                             break
-                if target_collection_name_found:
-                    relation_tuple = (target_collection_name_found, source_collection_name, "1:N", field_name)
-                    if relation_tuple not in detected_relationships:
-                        print(f"    ✅ Relación detectada: {relation_tuple[0]} --({relation_tuple[3]})--> {relation_tuple[1]} ({relation_tuple[2]})")
-                        detected_relationships.add(relation_tuple)
+    if profiles is None:
+        with metrics.stage("inferencia"):
+            profiles = collect_profiles(db_data, sample_size, sampling, executor=executor, max_workers=max_workers, cache=cache, metrics=metrics, with_values=mode != "name", with_cardinality=cardinality, max_depth=max_depth, max_width=max_width)
+    relationships_key = None
+    if cache is not None and name_index is None:
+        relationships_key = cache.relationships_key(
+            [profile.cache_key for profile in profiles.values()],
+            {"mode": mode, "min_confidence": min_confidence, "cardinality": cardinality, "aliases": DEFAULT_ALIASES if aliases is None else aliases},
+        )
+        cached_relationships = cache.get(relationships_key)
+        if cached_relationships is not None:
+            logger.info("--- Relaciones recuperadas de la caché de esquemas (ninguna colección cambió) ---")
+            metrics.count("relaciones_en_cache", len(cached_relationships))
+            return cached_relationships
+    logger.info("--- Iniciando detección automática de relaciones ---")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    resolved_fields = set()
+    if mode != "name":
+        logger.info("Comparando valores ObjectId contra los _id de cada colección (confianza mínima %.0f%%)...", min_confidence * 100)
+        without_values = [name for name, profile in profiles.items() if not profile.has_values]
+        if without_values:
+            logger.warning("⚠️ Sin valores para comparar en: %s. Solo se analizarán por nombre.", without_values)
+        id_filters = {name: profile.id_filter for name, profile in profiles.items() if profile.has_values}
+        reference_samples = {name: profile.reference_samples for name, profile in profiles.items() if profile.has_values}
+        with metrics.stage("deteccion_por_valores"):
+            value_references = find_value_references(id_filters, reference_samples, min_confidence)
+        for target_collection_name, source_collection_name, field_name, confidence in value_references:
+            relation_tuple = (target_collection_name, source_collection_name, "1:N", field_name, round(confidence, 3))
+            logger.debug("    ✅ Relación detectada por valores: %s --(%s)--> %s (%s, confianza %.0f%%)", relation_tuple[0], relation_tuple[3], relation_tuple[1], relation_tuple[2], confidence * 100)
+            detected_relationships.add(relation_tuple)
+            resolved_fields.add((source_collection_name, field_name))
+    if mode != "value":
+        if name_index is None:
+            name_index = CollectionNameIndex(db_data.keys(), aliases=aliases)
+        for source_collection_name, profile in profiles.items():
+            schema = profile.schema
+            if not schema:
+                logger.debug("Colección '%s' está vacía, saltando...", source_collection_name)
+                continue
+            if debug:
+                logger.debug("Analizando campos de %d documentos muestreados en '%s': %s", schema.sampled, source_collection_name, list(schema.field_types))
+            for field_name in schema.field_types:
+                if split_reference_field(field_name) and schema.has_type(field_name, "ObjectId"):
+                    if (source_collection_name, field_name) in resolved_fields:
+                        logger.debug("  > Campo '%s' en '%s' ya resuelto por valores.", field_name, source_collection_name)
+                        continue
+                    logger.debug("  > Campo encontrado '%s' en '%s' que parece una clave foránea.", field_name, source_collection_name)
+                    metrics.count("claves_candidatas", collection=source_collection_name)
+                    target_collection_name_found, match_method = name_index.resolve(field_name, source_collection_name)
+                    if target_collection_name_found:
+                        logger.debug("    >> Posible referencia a la colección: '%s' (coincidencia por %s)", target_collection_name_found, match_method)
+                        relation_tuple = (target_collection_name_found, source_collection_name, "1:N", field_name, None)
+                        if relation_tuple not in detected_relationships:
+                            logger.debug("    ✅ Relación detectada: %s --(%s)--> %s (%s)", relation_tuple[0], relation_tuple[3], relation_tuple[1], relation_tuple[2])
+                            detected_relationships.add(relation_tuple)
+                        else:
+                             logger.debug("    -> Relación %s ya detectada previamente.", relation_tuple)
                     else:
-                         print(f"    -> Relación {relation_tuple} ya detectada previamente.")
-                else:
-                    print(f"    ⚠️ No se encontró una colección correspondiente para '{field_name}' (se buscaron: {potential_target_names})")
-    print("--- Detección de relaciones finalizada ---")
-    return list(detected_relationships)
-
-x = random.randint(1, 1000)
-def generate_erd_graphviz_with_data_types(db_data, output_filename="Graph " + str(x) + " .png"):
+                        metrics.count("claves_sin_resolver", collection=source_collection_name)
+                        if debug:
+                            logger.debug("    ⚠️ No se encontró una colección correspondiente para '%s' (clave normalizada: '%s')", field_name, normalize_name(split_reference_field(field_name)))
+    if cardinality:
+        logger.info("Calculando cardinalidades (valores distintos y máximo de referencias por valor)...")
+        with metrics.stage("cardinalidad"):
+            detected_relationships = assign_cardinalities(detected_relationships, profiles)
+        for target, source, relation_cardinality, field, confidence in detected_relationships:
+            if relation_cardinality != "1:N":
+                logger.debug("    ↔ %s --(%s)--> %s: %s", target, field, source, relation_cardinality)
+    logger.info("--- Detección de relaciones finalizada: %d relaciones ---", len(detected_relationships))
+    metrics.count("relaciones", len(detected_relationships))
+    detected_relationships = sorted(detected_relationships, key=lambda relation: (relation[0], relation[1], relation[3]))
+    if relationships_key is not None:
+        cache.put(relationships_key, detected_relationships)
+    return detected_relationships
+
+def build_erd_graph(profiles, relationships, join_collections=(), metrics=NULL_METRICS):
+    return SchemaGraph.from_analysis(profiles, relationships, join_collections).to_pydot(metrics)
+
+def render_erd_graph(graph, output_filename=None, output_dir=".", formats=("png",), render_backend="auto"):
+    if output_filename is None:
+        outputs = output_paths(content_addressed_basename(graph, output_dir), formats)
+        if all(os.path.exists(path) for path in outputs.values()):
+            logger.info("♻️ El diagrama para este esquema ya existe en: %s. Se omite el render.", ", ".join(outputs.values()))
+            return outputs
+    else:
+        base_path, extension = os.path.splitext(output_filename)
+        outputs = {extension.lstrip(".") or "png": output_filename}
+        outputs.update(output_paths(base_path, [fmt for fmt in formats if fmt not in outputs]))
+    backend = render_backend if hasattr(render_backend, "render") else get_backend(render_backend)
+    logger.info("Intentando guardar el gráfico (%s) en: %s", backend.name, ", ".join(outputs.values()))
+    render_dot(graph.to_string(), outputs, backend)
+    logger.info("✅ Diagrama ERD con detección automática de relaciones guardado exitosamente en: %s", ", ".join(outputs.values()))
+    return outputs
+
+def generate_erd_graphviz_with_data_types(db_data, output_filename=None, *, output_dir=".", formats=("png",), render_backend="auto", sample_size=DEFAULT_SAMPLE_SIZE, sampling="first", mode="name", min_confidence=DEFAULT_MIN_CONFIDENCE, aliases=None, cardinality=True, collapse_joins=True, executor="auto", max_workers=None, cache=None, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, metrics=NULL_METRICS, profile_output=None, split=None, max_cluster_size=DEFAULT_MAX_CLUSTER_SIZE, ego=None, hops=1, snapshot_path=None, field_stats=False, stats_output=None, index_source=None, index_report=None):
     try:
-        graph = pydot.Dot(graph_type='digraph', rankdir='LR')
-        colors = ["lightblue", "lightgreen", "lightyellow", "lightcoral", "lightcyan", "lightsalmon", "lightpink", "lightgrey"]
-        print("\n--- Creando nodos para las colecciones ---")
-        color_index = 0
-        for collection_name, collection_data in db_data.items():
-            node_color = colors[color_index % len(colors)]
-            color_index += 1
-            node_label = f"{collection_name}\n{'-'*len(collection_name)}\n"
-            if collection_data:
-                first_doc = collection_data[0]
-                attribute_types = []
-                for attr, value in first_doc.items():
-                    data_type = type(value).__name__
-                    if isinstance(value, ObjectId):
-                        data_type = "ObjectId"
-                    elif isinstance(value, list):
-                         data_type = "list"
-                    attribute_types.append(f"{attr}: {data_type}")
-                node_label += "\n".join(attribute_types)
-                node = pydot.Node(collection_name, label=node_label, shape='box', style="filled", fillcolor=node_color)
-                graph.add_node(node)
-                print(f"Nodo creado para '{collection_name}' con {len(attribute_types)} atributos.")
-            else:
-                node_label += "(Colección Vacía)"
-                node = pydot.Node(collection_name, label=node_label, shape='box', style="filled", fillcolor=node_color, fontcolor="gray")
-                graph.add_node(node)
-                print(f"Nodo creado para colección vacía: '{collection_name}'.")
-        print("--- Nodos creados ---")
-        relationships = detect_relationships(db_data)
-        print("\n--- Añadiendo aristas para las relaciones detectadas ---")
-        if not relationships:
-             print("No se detectaron relaciones automáticamente.")
-        else:
-            for src, dest, cardinality, attribute in relationships:
-                if graph.get_node(src) and graph.get_node(dest):
-                    edge = pydot.Edge(src, dest, label=f"{cardinality}\n({attribute})")
-                    graph.add_edge(edge)
-                    print(f"Arista añadida: {src} -> {dest} [{attribute}]")
-                else:
-                     print(f"⚠️ Advertencia: Nodo '{src}' o '{dest}' no encontrado en el grafo. No se pudo añadir la arista para ({src}, {dest}, {attribute}).")
-        print("--- Aristas añadidas ---")
-        print(f"\nIntentando guardar el gráfico en: {output_filename}")
-        graph.write_png(output_filename)
-        print(f"✅ Diagrama ERD con detección automática de relaciones guardado exitosamente en: {output_filename}")
+        logger.info("--- Muestreando documentos (%s, hasta %d por colección) ---", sampling, sample_size)
+        logger.info("Ejecutor de análisis por colección: %s", executor)
+        options = dict(
+            output_filename=output_filename, output_dir=output_dir, formats=formats, render_backend=render_backend,
+            sample_size=sample_size, sampling=sampling, mode=mode, min_confidence=min_confidence, aliases=aliases, cardinality=cardinality,
+            collapse_joins=collapse_joins, executor=executor, max_workers=max_workers, cache=cache, max_depth=max_depth,
+            max_width=max_width, metrics=metrics, split=split, max_cluster_size=max_cluster_size, ego=ego, hops=hops,
+            snapshot_path=snapshot_path, field_stats=field_stats, stats_output=stats_output, index_source=index_source,
+            index_report=index_report,
+        )
+        if profile_output is not None:
+            with profiled(profile_output or None):
+                return _generate_erd(db_data, **options)
+        return _generate_erd(db_data, **options)
 
     except ImportError as ie:
-         print(f"\n❌ ERROR DE IMPORTACIÓN: {ie}")
-         print("Parece que 'pydot' o su dependencia 'Graphviz' no están instalados o configurados correctamente.")
-         print("Para instalar pydot, usa: pip install pydot")
-         print("Graphviz también debe estar instalado en tu sistema Y en el PATH.")
-         print("Descarga Graphviz desde: https://graphviz.org/download/")
-         print("Asegúrate de añadir la carpeta 'bin' de Graphviz a la variable de entorno PATH.")
+         logger.error("❌ ERROR DE IMPORTACIÓN: %s", ie)
+         logger.error("Parece que 'pydot' o su dependencia 'Graphviz' no están instalados o configurados correctamente.")
+         logger.error("Para instalar pydot, usa: pip install pydot")
+         logger.error("Graphviz también debe estar instalado en tu sistema Y en el PATH.")
+         logger.error("Descarga Graphviz desde: https://graphviz.org/download/")
+         logger.error("Asegúrate de añadir la carpeta 'bin' de Graphviz a la variable de entorno PATH.")
     except Exception as e:
-        print(f"\n❌ Ocurrió un error inesperado durante la generación del gráfico: {e}")
-        print("\n--- Traceback detallado ---")
-        traceback.print_exc()
-        print("--------------------------")
-
-user1_id = ObjectId()
-user2_id = ObjectId()
-user3_id = ObjectId()
-post1_id = ObjectId()
-post2_id = ObjectId()
-post3_id = ObjectId()
-comment1_id = ObjectId()
-comment2_id = ObjectId()
-comment3_id = ObjectId()
-category1_id = ObjectId()
-category2_id = ObjectId()
-tag1_id = ObjectId()
-tag2_id = ObjectId()
-tag3_id = ObjectId()
-product1_id = ObjectId()
-product2_id = ObjectId()
-review1_id = ObjectId()
-review2_id = ObjectId()
-review3_id = ObjectId()
-tagging1_id = ObjectId()
-tagging2_id = ObjectId()
-tagging3_id = ObjectId()
-tagging4_id = ObjectId()
-
-db_data = {
-    "users": [
-        {"_id": user1_id, "name": "Alice", "city": "Metropolis"},
-        {"_id": user2_id, "name": "Bob", "city": "Gotham"},
-        {"_id": user3_id, "name": "Charlie", "city": "Star City"}
-    ],
-    "categories": [
-        {"_id": category1_id, "name": "Tutorials", "type": "blog"},
-        {"_id": category2_id, "name": "Electronics", "type": "store"}
-    ],
-    "posts": [
-        {"_id": post1_id, "title": "Advanced Python", "content": "...", "user_id": user1_id, "category_id": category1_id},
-        {"_id": post2_id, "title": "Intro to MongoDB", "content": "...", "user_id": user2_id, "category_id": category1_id},
-        {"_id": post3_id, "title": "Data Viz", "content": "...", "user_id": user1_id, "category_id": category1_id}
-    ],
-    "comments": [
-        {"_id": comment1_id, "text": "Very helpful!", "post_id": post1_id, "user_id": user2_id},
-        {"_id": comment2_id, "text": "Good explanation.", "post_id": post2_id, "user_id": user1_id},
-        {"_id": comment3_id, "text": "I have a question...", "post_id": post1_id, "user_id": user3_id}
-    ],
-    "products": [
-        {"_id": product1_id, "name": "Laptop Pro", "price": 1200.00, "seller_id": user1_id, "category_id": category2_id},
-        {"_id": product2_id, "name": "Wireless Mouse", "price": 25.50, "seller_id": user2_id, "category_id": category2_id}
-    ],
-    "reviews": [
-        {"_id": review1_id, "text": "Excellent product!", "rating": 5, "product_id": product1_id, "user_id": user2_id},
-        {"_id": review2_id, "text": "Works great.", "rating": 4, "product_id": product2_id, "user_id": user3_id},
-        {"_id": review3_id, "text": "Good value for money.", "rating": 4, "product_id": product1_id, "user_id": user3_id}
-    ],
-    "tags": [
-        {"_id": tag1_id, "name": "python"},
-        {"_id": tag2_id, "name": "database"},
-        {"_id": tag3_id, "name": "webdev"}
-    ],
-    "taggings": [
-        {"_id": tagging1_id, "post_id": post1_id, "tag_id": tag1_id},
-        {"_id": tagging2_id, "post_id": post2_id, "tag_id": tag2_id},
-        {"_id": tagging3_id, "post_id": post1_id, "tag_id": tag3_id},
-        {"_id": tagging4_id, "post_id": post3_id, "tag_id": tag1_id}
-    ]
-}
-
-generate_erd_graphviz_with_data_types(db_data)
\ No newline at end of file
+        logger.exception("❌ Ocurrió un error inesperado durante la generación del gráfico: %s", e)
+
+def _generate_erd(db_data, *, output_filename, output_dir, formats, render_backend, sample_size, sampling, mode, min_confidence, aliases, cardinality, collapse_joins, executor, max_workers, cache, max_depth, max_width, metrics, split, max_cluster_size, ego, hops, snapshot_path, field_stats, stats_output, index_source, index_report):
+    schema_graph = analyze(db_data, sample_size=sample_size, sampling=sampling, mode=mode, min_confidence=min_confidence, cardinality=cardinality, collapse_joins=collapse_joins, executor=executor, max_workers=max_workers, cache=cache, max_depth=max_depth, max_width=max_width, metrics=metrics, field_stats=field_stats, stats_output=stats_output, aliases=aliases)
+    if snapshot_path is not None:
+        save_snapshot(schema_graph, snapshot_path)
+    if index_source is not None:
+        # Antes de recortar con --ego: el informe cubre todo el esquema y las marcas pasan al subgrafo.
+        with metrics.stage("indices"):
+            report = advise_indexes(schema_graph, read_index_catalog(index_source))
+        logger.info("--- Índices de claves ajenas ---\n%s", report.format_text())
+        metrics.count("claves_sin_indice", len(report.missing))
+        if index_report is not None:
+            report.save(index_report)
+            logger.info("Informe de índices guardado en %s", index_report)
+    if ego is not None:
+        logger.info("--- Subgrafo a %d saltos de '%s' ---", hops, ego)
+        schema_graph = ego_graph(schema_graph, ego, hops)
+    if split is not None:
+        return render_clusters(schema_graph, formats, output_dir, render_backend, split, max_cluster_size, max_workers, metrics)
+    return render(schema_graph, formats, output_filename, output_dir, render_backend, metrics)
+
+def resolve_source(source, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, keep_values=False):
+    # Acepta un dict {colección: documentos}, una base de datos de pymongo (se recorre con cursores)
+    # o la ruta de un volcado: directorio de mongodump / JSONL, o un único fichero .bson / .jsonl.
+    if isinstance(source, (str, os.PathLike)):
+        from dump_sources import directory_sources, file_source
+        path = os.fspath(source)
+        if os.path.isdir(path):
+            return directory_sources(path, max_depth, max_width, keep_values)
+        return file_source(path, max_depth, max_width, keep_values)
+    if hasattr(source, "list_collection_names"):
+        from mongo_loader import collection_sources
+        return collection_sources(source)
+    if hasattr(source, "items"):
+        return source
+    raise TypeError(f"Origen no soportado: {type(source).__name__} (se espera un dict de colecciones, una base de datos de pymongo o una ruta)")
+
+def analyze(source, sample_size=DEFAULT_SAMPLE_SIZE, sampling="first", mode="name", min_confidence=DEFAULT_MIN_CONFIDENCE, cardinality=True, collapse_joins=True, executor="auto", max_workers=None, cache=None, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, metrics=NULL_METRICS, field_stats=False, stats_output=None, aliases=None):
+    # field_stats muestra el resumen por campo en las etiquetas; stats_output exporta las estadísticas completas (.json o .csv).
+    with_stats = field_stats or stats_output is not None
+    db_data = resolve_source(source, max_depth, max_width, keep_values=with_stats)
+    with metrics.stage("inferencia"):
+        profiles = collect_profiles(db_data, sample_size, sampling, executor=executor, max_workers=max_workers, cache=cache, metrics=metrics, with_values=mode != "name", with_cardinality=cardinality, max_depth=max_depth, max_width=max_width, with_stats=with_stats)
+    if stats_output is not None:
+        export_field_stats(profiles, stats_output)
+        logger.info("📊 Estadísticas por campo guardadas en %s", stats_output)
+    return analyze_profiles(profiles, mode, min_confidence, cardinality, collapse_joins, cache, metrics, field_stats, aliases)
+
+def analyze_profiles(profiles, mode="name", min_confidence=DEFAULT_MIN_CONFIDENCE, cardinality=True, collapse_joins=True, cache=None, metrics=NULL_METRICS, field_stats=False, aliases=None):
+    with metrics.stage("deteccion"):
+        relationships = detect_relationships(profiles, profiles=profiles, aliases=aliases, mode=mode, min_confidence=min_confidence, cardinality=cardinality, cache=cache, metrics=metrics)
+    join_collections = ()
+    if collapse_joins:
+        relationships, join_collections = collapse_join_collections(relationships, profiles)
+    return SchemaGraph.from_analysis(profiles, relationships, join_collections, field_stats)
+
+def render(schema_graph, fmt="png", output_filename=None, output_dir=".", render_backend="auto", metrics=NULL_METRICS):
+    formats = (fmt,) if isinstance(fmt, str) else tuple(fmt)
+    with metrics.stage("construccion"):
+        graph = schema_graph.to_pydot(metrics)
+    with metrics.stage("render"):
+        return render_erd_graph(graph, output_filename, output_dir, formats, render_backend)
+
+def render_clusters(schema_graph, fmt="png", output_dir=".", render_backend="auto", method="components", max_cluster_size=DEFAULT_MAX_CLUSTER_SIZE, max_workers=None, metrics=NULL_METRICS):
+    # Un diagrama por grupo, renderizados en paralelo, más un índice con un nodo por grupo.
+    formats = (fmt,) if isinstance(fmt, str) else tuple(fmt)
+    backend = render_backend if hasattr(render_backend, "render") else get_backend(render_backend)
+    with metrics.stage("agrupacion"):
+        clusters = find_clusters(schema_graph, method, max_cluster_size)
+    logger.info("--- Esquema dividido en %d grupos (%s) ---", len(clusters), method)
+    jobs = []
+    cluster_outputs = []
+    with metrics.stage("construccion"):
+        for index, cluster in enumerate(clusters):
+            graph = schema_graph.subgraph(cluster).to_pydot(metrics)
+            outputs = output_paths(content_addressed_basename(graph, output_dir, f"Cluster{index:03d}"), formats)
+            cluster_outputs.append(outputs)
+            if not all(os.path.exists(path) for path in outputs.values()):
+                jobs.append((graph.to_string(), outputs))
+        # En el índice, cada grupo enlaza a su diagrama (clicable en SVG).
+        links = {index: os.path.basename(outputs.get("svg") or next(iter(outputs.values()))) for index, outputs in enumerate(cluster_outputs)}
+        overview = overview_graph(schema_graph, clusters, links)
+        overview_outputs = output_paths(content_addressed_basename(overview, output_dir, "Overview"), formats)
+        if not all(os.path.exists(path) for path in overview_outputs.values()):
+            jobs.append((overview.to_string(), overview_outputs))
+    metrics.count("grupos", len(clusters))
+    if len(jobs) > 1:
+        backend = parallel_backend(backend)
+    logger.info("Renderizando %d diagramas (%d ya existían) con %s...", len(jobs), len(clusters) + 1 - len(jobs), backend.name)
+    with metrics.stage("render"):
+        render_many(jobs, backend, max_workers)
+    logger.info("✅ Índice de grupos guardado en: %s", ", ".join(overview_outputs.values()))
+    return {"overview": overview_outputs, "clusters": cluster_outputs}
+
+def alias_argument(text):
+    field, separator, collection = text.partition("=")
+    if not separator or not field.strip() or not collection.strip():
+        raise argparse.ArgumentTypeError(f"alias inválido '{text}' (se espera CAMPO=COLECCIÓN, p. ej. seller=users)")
+    return field.strip(), collection.strip()
+
+def parse_aliases(pairs):
+    # Los alias de la línea de comandos se suman a los predeterminados (y los sustituyen si repiten campo).
+    return {**DEFAULT_ALIASES, **dict(pairs)} if pairs else None
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m Grafos", description="Genera el diagrama entidad-relación de una base de datos MongoDB.")
+    source = parser.add_argument_group("origen")
+    source.add_argument("--uri", help="URI de conexión de MongoDB (p. ej. mongodb://localhost:27017).")
+    source.add_argument("--database", help="Base de datos a analizar (obligatoria con --uri).")
+    source.add_argument("--input", metavar="RUTA", help="Volcado sin conexión: directorio de mongodump o de JSONL, o un fichero .bson/.jsonl.")
+    source.add_argument("--collection", action="append", help="Limita el análisis a estas colecciones (se puede repetir).")
+    output = parser.add_argument_group("salida")
+    output.add_argument("-o", "--output", help="Fichero de salida; por defecto se nombra por el hash del diagrama.")
+    output.add_argument("--output-dir", default=".")
+    output.add_argument("-f", "--format", action="append", choices=RENDER_FORMATS, help="Formatos de salida (se puede repetir; por defecto png).")
+    output.add_argument("--backend", choices=RENDER_BACKENDS, default="auto")
+    output.add_argument("--index-report", metavar="FICHERO", help="Escribe el informe de claves ajenas sin índice en este fichero JSON (implica --index-advice).")
+    output.add_argument("--snapshot", help="Guarda una instantánea JSON del esquema para compararla después (python -m snapshot).")
+    analysis = parser.add_argument_group("análisis")
+    analysis.add_argument("--mode", choices=RELATIONSHIP_MODES, default="name")
+    analysis.add_argument("--sampling", choices=SAMPLING_STRATEGIES, default="first")
+    analysis.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    analysis.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    analysis.add_argument("--alias", action="append", type=alias_argument, metavar="CAMPO=COLECCIÓN", help="Resuelve el campo CAMPO_id hacia COLECCIÓN cuando el nombre no coincide (p. ej. seller=users); se puede repetir.")
+    analysis.add_argument("--executor", choices=EXECUTORS, default="auto", help="auto: hilos para --uri (una consulta por colección a la vez), serie en otro caso.")
+    analysis.add_argument("--workers", type=int)
+    analysis.add_argument("--max-depth", type=int, default=DEFAULT_MAX_DEPTH)
+    analysis.add_argument("--max-width", type=int, default=DEFAULT_MAX_WIDTH)
+    analysis.add_argument("--no-cardinality", action="store_true", help="No estima 1:1/1:N/N:M; con --uri y --mode name solo viajan nombres y tipos.")
+    analysis.add_argument("--no-collapse-joins", action="store_true", help="Dibuja las colecciones intermedias en lugar de aristas N:M.")
+    analysis.add_argument("--cache-dir", help="Activa la caché de perfiles en este directorio.")
+    analysis.add_argument("--exact-cache", action="store_true", help="Con --uri, valida la caché con dbHash: ve cualquier cambio, pero lee cada colección entera en el servidor y bloquea las escrituras mientras tanto.")
+    analysis.add_argument("--index-advice", action="store_true", help="Comprueba qué claves ajenas no tienen índice y las marca en rojo en el diagrama.")
+    analysis.add_argument("--field-stats", action="store_true", help="Añade a cada campo presencia, nulos, valores distintos aproximados y tamaño medio.")
+    analysis.add_argument("--stats-output", metavar="FICHERO", help="Exporta las estadísticas por campo (con top-k de valores) a un fichero .json o .csv.")
+    subgraphs = parser.add_argument_group("esquemas grandes")
+    subgraphs.add_argument("--split", choices=CLUSTER_METHODS, help="Un diagrama por componente conexa o comunidad, más un índice.")
+    subgraphs.add_argument("--max-cluster-size", type=int, default=DEFAULT_MAX_CLUSTER_SIZE, help="Con --split communities, tamaño a partir del cual se parte una componente.")
+    subgraphs.add_argument("--ego", metavar="COLECCIÓN", help="Dibuja solo el entorno de esta colección.")
+    subgraphs.add_argument("--hops", type=int, default=1, help="Saltos alrededor de --ego.")
+    diagnostics = parser.add_argument_group("diagnóstico")
+    diagnostics.add_argument("-v", "--verbose", action="store_true", help="Registro detallado (DEBUG).")
+    diagnostics.add_argument("-q", "--quiet", action="store_true", help="Solo advertencias y errores.")
+    diagnostics.add_argument("--metrics-json", help="Escribe tiempos por etapa y contadores en este fichero JSON.")
+    diagnostics.add_argument("--profile", nargs="?", const="", help="Ejecuta bajo cProfile; con ruta, guarda las estadísticas en ella.")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO)
+    client = None
+    index_source = None
+    if args.uri:
+        if not args.database:
+            logger.error("❌ --database es obligatorio junto con --uri.")
+            return 2
+        from mongo_loader import DEFAULT_MAX_WORKERS, collection_sources, connect, load_schemas
+        max_workers = args.workers or DEFAULT_MAX_WORKERS
+        client = connect(args.uri, max_pool_size=max_workers)
+        database = client[args.database]
+        if args.mode == "name" and args.no_cardinality and not (args.field_stats or args.stats_output):
+            # Solo hacen falta nombres y tipos: todas las colecciones se muestrean a la vez en el servidor.
+            db_data = load_schemas(database, args.sample_size, args.sampling, args.collection, max_workers, args.max_depth, args.max_width)
+        else:
+            db_data = collection_sources(database, args.collection, exact_marker=args.exact_cache)
+        index_source = database
+    elif args.input:
+        from dump_sources import directory_sources, file_source
+        if not os.path.exists(args.input):
+            logger.error("❌ No existe la ruta de entrada: %s", args.input)
+            return 2
+        # Las estadísticas por campo necesitan los valores; para el esquema bastan los marcadores de tipo.
+        keep_values = args.field_stats or args.stats_output is not None
+        if os.path.isdir(args.input):
+            db_data = directory_sources(args.input, args.max_depth, args.max_width, keep_values)
+        else:
+            try:
+                db_data = file_source(args.input, args.max_depth, args.max_width, keep_values)
+            except ValueError as e:
+                logger.error("❌ %s", e)
+                return 2
+        if args.collection:
+            db_data = {name: db_data[name] for name in args.collection if name in db_data}
+        index_source = args.input
+        if not db_data:
+            logger.error("❌ No se encontraron ficheros .bson ni .jsonl en %s", args.input)
+            return 2
+    else:
+        from sample_data import build_sample_database
+        logger.info("Sin --uri: se usa la base de datos de ejemplo.")
+        db_data = build_sample_database()
+        # Los datos de ejemplo no declaran índices: solo cuenta el de _id.
+        index_source = {}
+        if args.collection:
+            db_data = {name: db_data[name] for name in args.collection if name in db_data}
+    cache = None
+    if args.cache_dir:
+        from schema_cache import SchemaCache
+        cache = SchemaCache(args.cache_dir, namespace=args.database or (os.path.abspath(args.input) if args.input else "sample"))
+    metrics = Metrics() if args.metrics_json else NULL_METRICS
+    try:
+        outputs = generate_erd_graphviz_with_data_types(
+            db_data, args.output, output_dir=args.output_dir, formats=tuple(args.format or ("png",)), render_backend=args.backend,
+            sample_size=args.sample_size, sampling=args.sampling, mode=args.mode, min_confidence=args.min_confidence, aliases=parse_aliases(args.alias),
+            cardinality=not args.no_cardinality, collapse_joins=not args.no_collapse_joins, executor=args.executor, max_workers=args.workers, cache=cache,
+            max_depth=args.max_depth, max_width=args.max_width, metrics=metrics, profile_output=args.profile,
+            split=args.split, max_cluster_size=args.max_cluster_size, ego=args.ego, hops=args.hops, snapshot_path=args.snapshot,
+            field_stats=args.field_stats, stats_output=args.stats_output,
+            index_source=index_source if args.index_advice or args.index_report else None, index_report=args.index_report,
+        )
+    finally:
+        if client is not None:
+            client.close()
+    if args.metrics_json:
+        metrics.dump_json(args.metrics_json)
+        logger.info("Métricas guardadas en %s", args.metrics_json)
+    return 0 if outputs else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import time
+from functools import partial
+
+from containment import DEFAULT_MIN_CONFIDENCE
+from instrumentation import NULL_METRICS, configure_logging
+from profiling import CollectionProfiler
+from rendering import RENDER_BACKENDS, RENDER_FORMATS, content_addressed_basename, get_backend, output_paths, render_dot
+from sampling import DEFAULT_MAX_DEPTH, DEFAULT_MAX_WIDTH, DEFAULT_SAMPLE_SIZE, SAMPLING_STRATEGIES
+
+logger = logging.getLogger("grafos.async_pipeline")
+
+DEFAULT_MAX_DATABASES = 8
+DEFAULT_MAX_COLLECTIONS = 32
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PROFILE_BATCH_SIZE = 500
+SYSTEM_DATABASES = ("admin", "config", "local")
+
+
+class MotorSource:
+    # Base de datos de motor (driver asíncrono de MongoDB) como origen: el cursor se consume con async for.
+    def __init__(self, database, batch_size=DEFAULT_BATCH_SIZE, projection=None):
+        self.database = database
+        self.batch_size = batch_size
+        self.projection = projection
+
+    async def list_collection_names(self):
+        names = await self.database.list_collection_names()
+        return sorted(name for name in names if not name.startswith("system."))
+
+    def documents(self, collection_name):
+        return self.database[collection_name].find({}, self.projection, batch_size=self.batch_size)
+
+
+class FakeAsyncSource:
+    # Sustituto en proceso de MotorSource para pruebas y benchmarks: sirve un dict {colección: documentos}
+    # por lotes, con una latencia simulada por lote para reproducir inquilinos lentos.
+    def __init__(self, db_data, latency=0.0, batch_size=100):
+        self.db_data = db_data
+        self.latency = latency
+        self.batch_size = batch_size
+
+    async def list_collection_names(self):
+        await asyncio.sleep(self.latency)
+        return list(self.db_data)
+
+    async def documents(self, collection_name):
+        documents = self.db_data[collection_name] or ()
+        for start in range(0, len(documents), self.batch_size):
+            await asyncio.sleep(self.latency)
+            for document in documents[start:start + self.batch_size]:
+                yield document
+
+
+def _profile_batch(profiler, documents):
+    # Corre en un hilo del ejecutor: aplanar y perfilar es CPU y no debe parar el bucle de eventos.
+    for document in documents:
+        if profiler.done:
+            break
+        profiler.add(document)
+    return profiler.done
+
+
+def connect_motor(uri="mongodb://localhost:27017", **kwargs):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(uri, **kwargs)
+
+
+async def motor_sources(client, database_names=None, batch_size=DEFAULT_BATCH_SIZE):
+    if database_names is None:
+        database_names = sorted(name for name in await client.list_database_names() if name not in SYSTEM_DATABASES)
+    return {name: MotorSource(client[name], batch_size) for name in database_names}
+
+
+class DatabaseResult:
+    __slots__ = ("name", "graph", "outputs", "error", "seconds")
+
+    def __init__(self, name):
+        self.name = name
+        self.graph = None
+        self.outputs = None
+        self.error = None
+        self.seconds = 0.0
+
+    def __repr__(self):
+        status = f"error={self.error!r}" if self.error else f"{self.graph}"
+        return f"DatabaseResult({self.name!r}, {status}, {self.seconds:.3f} s)"
+
+
+class AsyncPipeline:
+    # Muestreo -> detección -> render en etapas unidas por colas acotadas:
+    # - un semáforo limita las bases de datos en curso y otro los cursores abiertos a la vez (entre todas ellas);
+    # - cada base de datos pasa a detección en cuanto termina, sin esperar a las demás: un inquilino lento no frena al resto;
+    # - si detección o render se atrasan, las colas llenas bloquean a los productores (contrapresión) y no se abren más bases.
+    # El perfilado (por lotes), la detección y el render son CPU o procesos externos: corren en hilos para no detener
+    # el bucle de eventos.
+    def __init__(self, max_databases=DEFAULT_MAX_DATABASES, max_collections=DEFAULT_MAX_COLLECTIONS, queue_size=DEFAULT_QUEUE_SIZE,
+                 detect_workers=2, render_workers=2, formats=(), output_dir=".", render_backend="auto",
+                 sample_size=DEFAULT_SAMPLE_SIZE, sampling="first", mode="name", min_confidence=DEFAULT_MIN_CONFIDENCE, aliases=None,
+                 cardinality=True, collapse_joins=True, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, metrics=NULL_METRICS,
+                 profile_batch_size=DEFAULT_PROFILE_BATCH_SIZE):
+        self.max_databases = max_databases
+        self.max_collections = max_collections
+        self.queue_size = queue_size
+        self.detect_workers = detect_workers
+        self.render_workers = render_workers
+        self.formats = tuple(formats)
+        self.output_dir = output_dir
+        self.render_backend = render_backend
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.aliases = aliases
+        self.cardinality = cardinality
+        self.collapse_joins = collapse_joins
+        self.metrics = metrics
+        self.profile_batch_size = profile_batch_size
+        self.profile_options = dict(sample_size=sample_size, strategy=sampling, with_values=mode != "name",
+                                    with_cardinality=cardinality, max_depth=max_depth, max_width=max_width)
+
+    async def run(self, sources, on_result=None):
+        database_slots = asyncio.Semaphore(self.max_databases)
+        collection_slots = asyncio.Semaphore(self.max_collections)
+        detect_queue = asyncio.Queue(self.queue_size)
+        render_queue = asyncio.Queue(self.queue_size)
+        results = {name: DatabaseResult(name) for name in sources}
+        backend = None
+        if self.formats:
+            os.makedirs(self.output_dir, exist_ok=True)
+            backend = self.render_backend if hasattr(self.render_backend, "render") else get_backend(self.render_backend)
+        detectors = [asyncio.create_task(self._detect_worker(detect_queue, render_queue, results, on_result)) for _ in range(self.detect_workers)]
+        renderers = [asyncio.create_task(self._render_worker(render_queue, backend, on_result)) for _ in range(self.render_workers)]
+        producers = [
+            asyncio.create_task(self._profile_database(name, source, database_slots, collection_slots, detect_queue, results[name], on_result))
+            for name, source in sources.items()
+        ]
+        await asyncio.gather(*producers)
+        for _ in detectors:
+            await detect_queue.put(None)
+        await asyncio.gather(*detectors)
+        for _ in renderers:
+            await render_queue.put(None)
+        await asyncio.gather(*renderers)
+        return results
+
+    async def _profile_database(self, name, source, database_slots, collection_slots, detect_queue, result, on_result):
+        async with database_slots:
+            start = time.perf_counter()
+            try:
+                collection_names = await source.list_collection_names()
+                profiles = await asyncio.gather(*(
+                    self._profile_collection(source, collection_name, collection_slots) for collection_name in collection_names
+                ))
+            except Exception as e:
+                logger.exception("❌ Error muestreando la base de datos '%s': %s", name, e)
+                result.error = e
+                result.seconds = time.perf_counter() - start
+                self._notify(on_result, result)
+                return
+            self.metrics.count("colecciones", len(collection_names), collection=name)
+            logger.info("Base de datos '%s' muestreada: %d colecciones en %.2f s", name, len(collection_names), time.perf_counter() - start)
+            # put() espera si la cola está llena: la ranura de base de datos sigue ocupada y no entra otra nueva.
+            await detect_queue.put((result, dict(zip(collection_names, profiles)), start))
+
+    async def _profile_collection(self, source, collection_name, collection_slots):
+        async with collection_slots:
+            loop = asyncio.get_running_loop()
+            profiler = CollectionProfiler(collection_name, **self.profile_options)
+            documents = source.documents(collection_name)
+            # Mientras un lote se perfila en el ejecutor, el cursor ya va leyendo el siguiente. Como mucho se lee un lote de más
+            # tras completar la muestra.
+            pending = None
+            batch = []
+            complete = False
+            try:
+                async for document in documents:
+                    batch.append(document)
+                    if len(batch) < self.profile_batch_size:
+                        continue
+                    if pending is not None and await pending:
+                        break
+                    pending = loop.run_in_executor(None, _profile_batch, profiler, batch)
+                    batch = []
+                else:
+                    done = await pending if pending is not None else False
+                    if batch and not done:
+                        done = await loop.run_in_executor(None, _profile_batch, profiler, batch)
+                    # El cursor se agotó: los perfiladores vieron la colección entera (salvo que la muestra ya estuviera completa).
+                    complete = not done
+            finally:
+                close = getattr(documents, "aclose", None) or getattr(documents, "close", None)
+                if close is not None:
+                    closing = close()
+                    if inspect.isawaitable(closing):
+                        await closing
+            return profiler.result(complete)
+
+    async def _detect_worker(self, detect_queue, render_queue, results, on_result):
+        from Grafos import analyze_profiles
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await detect_queue.get()
+            if item is None:
+                return
+            result, profiles, start = item
+            try:
+                result.graph = await loop.run_in_executor(
+                    None, partial(analyze_profiles, profiles, self.mode, self.min_confidence, self.cardinality, self.collapse_joins,
+                                  aliases=self.aliases)
+                )
+            except Exception as e:
+                logger.exception("❌ Error detectando relaciones en '%s': %s", result.name, e)
+                result.error = e
+            result.seconds = time.perf_counter() - start
+            if self.formats and result.error is None:
+                await render_queue.put(result)
+            else:
+                self._notify(on_result, result)
+
+    async def _render_worker(self, render_queue, backend, on_result):
+        loop = asyncio.get_running_loop()
+        while True:
+            result = await render_queue.get()
+            if result is None:
+                return
+            try:
+                result.outputs = await loop.run_in_executor(None, self._render, result, backend)
+            except Exception as e:
+                logger.exception("❌ Error renderizando '%s': %s", result.name, e)
+                result.error = e
+            self._notify(on_result, result)
+
+    def _render(self, result, backend):
+        graph = result.graph.to_pydot()
+        outputs = output_paths(content_addressed_basename(graph, self.output_dir, result.name), self.formats)
+        if not all(os.path.exists(path) for path in outputs.values()):
+            render_dot(graph.to_string(), outputs, backend)
+        return outputs
+
+    def _notify(self, on_result, result):
+        self.metrics.count("bases_de_datos")
+        if result.error is None:
+            logger.info("✅ '%s' terminada en %.2f s: %s", result.name, result.seconds, result.graph)
+        if on_result is not None:
+            on_result(result)
+
+
+def analyze_databases(sources, on_result=None, **options):
+    return asyncio.run(AsyncPipeline(**options).run(sources, on_result))
+
+
+def main(argv=None):
+    from Grafos import alias_argument, parse_aliases
+    parser = argparse.ArgumentParser(prog="python -m async_pipeline", description="Analiza muchas bases de datos MongoDB a la vez (requiere motor).")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", action="append", help="Bases de datos a analizar (por defecto todas salvo admin/config/local).")
+    parser.add_argument("--max-databases", type=int, default=DEFAULT_MAX_DATABASES)
+    parser.add_argument("--max-collections", type=int, default=DEFAULT_MAX_COLLECTIONS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--mode", choices=("name", "value", "both"), default="name")
+    parser.add_argument("--sampling", choices=SAMPLING_STRATEGIES, default="first")
+    parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    parser.add_argument("--alias", action="append", type=alias_argument, metavar="CAMPO=COLECCIÓN", help="Resuelve CAMPO_id hacia COLECCIÓN (p. ej. seller=users); se puede repetir.")
+    parser.add_argument("-f", "--format", action="append", choices=RENDER_FORMATS, help="Renderiza cada base de datos en estos formatos.")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, default="auto")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    configure_logging(logging.WARNING if args.quiet else logging.INFO)
+
+    async def run():
+        client = connect_motor(args.uri)
+        try:
+            sources = await motor_sources(client, args.database)
+            pipeline = AsyncPipeline(args.max_databases, args.max_collections, args.queue_size, formats=args.format or (),
+                                     output_dir=args.output_dir, render_backend=args.backend, sample_size=args.sample_size,
+                                     sampling=args.sampling, mode=args.mode, aliases=parse_aliases(args.alias))
+            return await pipeline.run(sources)
+        finally:
+            client.close()
+
+    results = asyncio.run(run())
+    failed = [name for name, result in results.items() if result.error is not None]
+    if failed:
+        logger.error("❌ %d de %d bases de datos con errores: %s", len(failed), len(results), failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from instrumentation import configure_logging
+from synthetic import generate_database
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.2
+STAGES = ("inference", "detection", "rendering")
+
+SCENARIOS = {
+    "small": dict(collections=10, documents=200, fields=6),
+    "medium": dict(collections=50, documents=2000, fields=10),
+    "wide": dict(collections=400, documents=200, fields=30, fk_density=3),
+    "deep": dict(collections=30, documents=1000, fields=8, nesting_depth=4),
+    "varied": dict(collections=30, documents=2000, fields=12, type_variance=0.5),
+}
+
+
+def measure(function, track_memory):
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run_stages(db_data, options, render_formats, track_memory):
+    import Grafos
+    from cardinality import collapse_join_collections
+    from profiling import collect_profiles
+
+    mode = options.get("mode", "name")
+    profile_options = dict(sample_size=options.get("sample_size", 1000), strategy=options.get("sampling", "first"),
+                           executor=options.get("executor", "serial"), with_values=mode != "name", with_cardinality=True)
+    results = {}
+    profiles, results["inference"], peak_inference = measure(lambda: collect_profiles(db_data, **profile_options), track_memory)
+    relationships, results["detection"], peak_detection = measure(
+        lambda: collapse_join_collections(Grafos.detect_relationships(db_data, profiles=profiles, mode=mode), profiles), track_memory)
+    relationships, join_collections = relationships
+
+    def render():
+        graph = Grafos.build_erd_graph(profiles, relationships, join_collections)
+        if render_formats:
+            return Grafos.render_erd_graph(graph, output_dir=options["output_dir"], formats=render_formats)
+        return graph.to_string()
+
+    _, results["rendering"], peak_rendering = measure(render, track_memory)
+    peaks = {"inference": peak_inference, "detection": peak_detection, "rendering": peak_rendering}
+    return results, peaks
+
+
+def run_scenario(name, params, options, repeat=3, render_formats=()):
+    db_data = generate_database(**params)
+    timings = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        seconds, _ = run_stages(db_data, options, render_formats, track_memory=False)
+        for stage in STAGES:
+            timings[stage].append(seconds[stage])
+    # La memoria se mide en una pasada aparte: tracemalloc distorsiona los tiempos.
+    _, peaks = run_stages(db_data, options, render_formats, track_memory=True)
+    return {stage: {"seconds": min(timings[stage]), "peak_bytes": peaks[stage]} for stage in STAGES}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, metrics in stages.items():
+            previous = baseline.get(scenario, {}).get(stage)
+            if not previous:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                if not previous.get(metric):
+                    continue
+                ratio = metrics[metric] / previous[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append((scenario, stage, metric, previous[metric], metrics[metric], ratio))
+    return regressions
+
+
+def format_report(results, baseline=None):
+    lines = [f"{'escenario':<10} {'etapa':<10} {'segundos':>10} {'pico MiB':>10} {'vs base':>9}"]
+    for scenario, stages in results.items():
+        for stage, metrics in stages.items():
+            previous = (baseline or {}).get(scenario, {}).get(stage, {})
+            delta = f"{metrics['seconds'] / previous['seconds']:.2f}x" if previous.get("seconds") else "-"
+            lines.append(f"{scenario:<10} {stage:<10} {metrics['seconds']:>10.4f} {metrics['peak_bytes'] / 2**20:>10.2f} {delta:>9}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de inferencia, detección y render sobre bases de datos sintéticas.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Escenarios a ejecutar (por defecto todos).")
+    parser.add_argument("--collections", type=int, help="Sobrescribe el número de colecciones.")
+    parser.add_argument("--documents", type=int, help="Sobrescribe los documentos por colección.")
+    parser.add_argument("--fields", type=int, help="Sobrescribe los campos por documento.")
+    parser.add_argument("--fk-density", type=float, help="Claves foráneas esperadas por colección.")
+    parser.add_argument("--nesting-depth", type=int, help="Niveles de subdocumentos anidados.")
+    parser.add_argument("--type-variance", type=float, help="Probabilidad de que un valor cambie de tipo.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("name", "value", "both"), default="name")
+    parser.add_argument("--executor", choices=("serial", "thread", "process"), default="serial")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--render-format", action="append", default=[], help="Renderiza de verdad (p. ej. png); por defecto solo se genera el DOT.")
+    parser.add_argument("--output-dir", default="bench_output")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", help="Escribe los resultados en este fichero JSON.")
+    parser.add_argument("--verbose", action="store_true", help="Muestra el registro de las etapas (nivel INFO) durante las mediciones.")
+    args = parser.parse_args(argv)
+    if args.verbose:
+        configure_logging(logging.INFO, sys.stderr)
+
+    overrides = {key: getattr(args, key) for key in ("collections", "documents", "fields", "fk_density", "nesting_depth", "type_variance")
+                 if getattr(args, key) is not None}
+    options = {"mode": args.mode, "executor": args.executor, "output_dir": args.output_dir}
+    if args.render_format:
+        os.makedirs(args.output_dir, exist_ok=True)
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        params = {**SCENARIOS[name], **overrides, "seed": args.seed}
+        print(f"Ejecutando escenario '{name}': {params}", file=sys.stderr)
+        results[name] = run_scenario(name, params, options, args.repeat, tuple(args.render_format))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(results, baseline))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    regressions = compare(results, baseline, args.tolerance)
+    for scenario, stage, metric, previous, current, ratio in regressions:
+        print(f"⚠️ Regresión en {scenario}/{stage} ({metric}): {previous:.4g} -> {current:.4g} ({ratio:.2f}x)")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"Línea base guardada en {args.baseline}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import hashlib
+import math
+from array import array
+
+from containment import object_id_bytes
+
+DEFAULT_HLL_PRECISION = 12
+DEFAULT_CMS_WIDTH = 4096
+DEFAULT_CMS_DEPTH = 4
+
+
+def _hashes64(key, count):
+    digest = hashlib.blake2b(key, digest_size=8 * count).digest()
+    return [int.from_bytes(digest[i:i + 8], "little") for i in range(0, 8 * count, 8)]
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.size)
+
+    def add(self, key):
+        self.add_hash(_hashes64(key, 1)[0])
+
+    def add_hash(self, value):
+        index = value >> (64 - self.precision)
+        rest = (value << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = 65 - self.precision if rest == 0 else (64 - rest.bit_length()) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        for index, rank in enumerate(other.registers):
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            return self.size * math.log(self.size / zeros)
+        return estimate
+
+
+class CountMinSketch:
+    def __init__(self, width=DEFAULT_CMS_WIDTH, depth=DEFAULT_CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def add(self, key, count=1):
+        return self.add_hashes(_hashes64(key, self.depth), count)
+
+    def add_hashes(self, hashes, count=1):
+        estimate = None
+        for row, value in zip(self.rows, hashes):
+            column = value % self.width
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[value % self.width] for row, value in zip(self.rows, _hashes64(key, self.depth)))
+
+    def merge(self, other):
+        for row, other_row in zip(self.rows, other.rows):
+            for column, count in enumerate(other_row):
+                if count:
+                    row[column] += count
+        return self
+
+    def upper_bound(self):
+        # Cota de la estimación de cualquier clave sin conocer las claves: una clave con frecuencia f deja al menos f
+        # en una celda de cada fila, así que ninguna supera el menor de los máximos por fila.
+        return min(max(row) for row in self.rows)
+
+
+class SpaceSaving:
+    # Top-k aproximado (Metwally et al.) con k contadores: memoria fija sea cual sea el número de valores distintos.
+    # Cada contador guarda (frecuencia, error máximo); los valores con frecuencia real > n/k siempre están presentes.
+    def __init__(self, capacity=10):
+        self.capacity = capacity
+        self.counters = {}
+
+    def add(self, key, count=1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [count, 0]
+        else:
+            evicted = min(self.counters, key=lambda candidate: self.counters[candidate][0])
+            minimum = self.counters.pop(evicted)[0]
+            self.counters[key] = [minimum + count, minimum]
+
+    def merge(self, other):
+        for key, (frequency, _) in other.counters.items():
+            self.add(key, frequency)
+        return self
+
+    def top(self, k=None):
+        ranked = sorted(self.counters.items(), key=lambda item: (-item[1][0], str(item[0])))
+        return [(key, frequency, error) for key, (frequency, error) in ranked[:k]]
+
+
+class FieldCardinality:
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, width=DEFAULT_CMS_WIDTH, depth=DEFAULT_CMS_DEPTH):
+        self.count = 0
+        self.distinct = HyperLogLog(precision)
+        self.frequencies = CountMinSketch(width, depth)
+        self.max_fan_out = 0
+        # Solo un recorrido de toda la colección puede demostrar que no hay repeticiones; una muestra solo puede refutarlo.
+        self.complete = False
+
+    def add(self, key):
+        self.count += 1
+        # Un solo hash ancho por valor: los primeros 64 bits van al HyperLogLog y el resto a las filas del count-min.
+        hashes = _hashes64(key, self.frequencies.depth + 1)
+        self.distinct.add_hash(hashes[0])
+        # El count-min nunca subestima: si su máximo es 1, ningún valor se repite.
+        self.max_fan_out = max(self.max_fan_out, self.frequencies.add_hashes(hashes[1:]))
+
+    def merge(self, other):
+        self.count += other.count
+        self.distinct.merge(other.distinct)
+        self.frequencies.merge(other.frequencies)
+        # Sin las claves no se puede recalcular el máximo exacto; la cota mantiene segura la conclusión "sin repeticiones".
+        self.max_fan_out = self.frequencies.upper_bound()
+        return self
+
+    @property
+    def unique(self):
+        if self.max_fan_out <= 1:
+            return True
+        return self.distinct.count() >= self.count * (1 - 2 * self.distinct.relative_error)
+
+    def label(self, multi_valued=False):
+        # Referencias dentro de arrays ("tag_ids[]", "items[].product_id"): un documento apunta a varios destinos.
+        # Sin recorrido completo se mantiene la etiqueta "a muchos": la muestra no cambia de una ejecución a otra.
+        unique = self.complete and self.unique
+        if multi_valued:
+            return "N:1" if unique else "N:M"
+        return "1:1" if unique else "1:N"
+
+
+class CardinalityProfiler:
+    # Con `limit`, los bocetos solo ven los primeros documentos (los mismos que el muestreo) y el recorrido
+    # puede cortarse ahí; sin límite obligan a leer la colección entera. Quien alimenta al perfilador indica en
+    # result() si llegó a ver la colección completa.
+    def __init__(self, limit=None, precision=DEFAULT_HLL_PRECISION, width=DEFAULT_CMS_WIDTH, depth=DEFAULT_CMS_DEPTH):
+        self.limit = limit
+        self.options = (precision, width, depth)
+        self.documents = 0
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self.limit is not None and self.documents >= self.limit
+
+    def add(self, document, fields=None):
+        if self.done:
+            return
+        self.documents += 1
+        for field, value in document.items() if fields is None else fields:
+            if field == "_id":
+                continue
+            key = object_id_bytes(value)
+            if key is None:
+                continue
+            stats = self.fields.get(field)
+            if stats is None:
+                stats = self.fields[field] = FieldCardinality(*self.options)
+            stats.add(key)
+
+    def merge(self, other):
+        self.documents += other.documents
+        for field, stats in other.fields.items():
+            mine = self.fields.get(field)
+            if mine is None:
+                self.fields[field] = stats
+            else:
+                mine.merge(stats)
+        return self
+
+    def result(self, complete=False):
+        for stats in self.fields.values():
+            stats.complete = complete
+        return self.fields
+
+
+def assign_cardinalities(relationships, profiles):
+    labelled = []
+    for target, source, cardinality, field, confidence in relationships:
+        stats = (profiles[source].field_cardinality or {}).get(field) if source in profiles else None
+        if stats is not None and stats.count:
+            cardinality = stats.label(multi_valued="[]" in field)
+        labelled.append((target, source, cardinality, field, confidence))
+    return labelled
+
+
+def find_join_collections(relationships, profiles, max_extra_fields=0):
+    outgoing = {}
+    referenced = set()
+    for target, source, cardinality, field, confidence in relationships:
+        outgoing.setdefault(source, []).append((target, cardinality, field, confidence))
+        referenced.add(target)
+    joins = {}
+    for source, edges in outgoing.items():
+        if source in referenced or len(edges) != 2:
+            continue
+        (first, first_cardinality, first_field, _), (second, second_cardinality, second_field, _) = sorted(edges)
+        if first == second or "1:N" not in (first_cardinality, second_cardinality):
+            continue
+        extra_fields = [f for f in profiles[source].schema.field_types if f not in ("_id", first_field, second_field)]
+        if len(extra_fields) > max_extra_fields:
+            continue
+        joins[source] = ((first, first_field), (second, second_field))
+    return joins
+
+
+def join_label(join_name, first_field, second_field):
+    return f"{join_name}: {first_field}/{second_field}"
+
+
+def collapse_join_collections(relationships, profiles, max_extra_fields=0):
+    # Devuelve las relaciones con cada intermedia sustituida por una arista N:M, y las intermedias
+    # {nombre: ((primera, campo), (segunda, campo))} para quien necesite su estructura (SchemaGraph).
+    joins = find_join_collections(relationships, profiles, max_extra_fields)
+    collapsed = [relation for relation in relationships if relation[1] not in joins]
+    for join_name, ((first, first_field), (second, second_field)) in joins.items():
+        collapsed.append((first, second, "N:M", join_label(join_name, first_field, second_field), None))
+    return collapsed, {join_name: joins[join_name] for join_name in sorted(joins)}
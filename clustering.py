@@ -0,0 +1,150 @@
+from array import array
+from collections import Counter, deque
+
+CLUSTER_METHODS = ("components", "communities")
+DEFAULT_MAX_CLUSTER_SIZE = 40
+DEFAULT_PROPAGATION_ROUNDS = 20
+OVERVIEW_MEMBERS = 8
+
+
+def _neighbors(graph, collection_id):
+    return graph.successors(collection_id) + graph.predecessors(collection_id)
+
+
+def connected_components(graph):
+    # Union-find sobre los arrays de aristas (ignorando la dirección): lineal en colecciones + relaciones.
+    parent = array("I", range(graph.collection_count))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for source_id, target_id in zip(graph.edge_sources, graph.edge_targets):
+        root_a, root_b = find(source_id), find(target_id)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    components = {}
+    for collection_id in graph.visible():
+        components.setdefault(find(collection_id), []).append(collection_id)
+    return list(components.values())
+
+
+def label_propagation(graph, collection_ids, rounds=DEFAULT_PROPAGATION_ROUNDS):
+    # Propagación de etiquetas determinista: cada colección adopta la etiqueta más frecuente entre sus vecinas
+    # (empates -> la menor). Converge en pocas rondas y agrupa las zonas densamente referenciadas.
+    members = set(collection_ids)
+    labels = {collection_id: collection_id for collection_id in collection_ids}
+    for _ in range(rounds):
+        changed = False
+        for collection_id in collection_ids:
+            counts = Counter(labels[neighbor] for neighbor in _neighbors(graph, collection_id) if neighbor in members)
+            if not counts:
+                continue
+            best = max(counts.values())
+            label = min(candidate for candidate, count in counts.items() if count == best)
+            if label != labels[collection_id]:
+                labels[collection_id] = label
+                changed = True
+        if not changed:
+            break
+    communities = {}
+    for collection_id in collection_ids:
+        communities.setdefault(labels[collection_id], []).append(collection_id)
+    return list(communities.values())
+
+
+def bfs_chunks(graph, collection_ids, size):
+    # Último recurso para comunidades que siguen siendo demasiado grandes: trozos consecutivos en orden BFS,
+    # así cada trozo conserva vecindades en lugar de cortar al azar.
+    members = set(collection_ids)
+    order = []
+    seen = set()
+    for start in collection_ids:
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        while queue:
+            collection_id = queue.popleft()
+            order.append(collection_id)
+            for neighbor in _neighbors(graph, collection_id):
+                if neighbor in members and neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    return [order[i:i + size] for i in range(0, len(order), size)]
+
+
+def find_clusters(graph, method="components", max_cluster_size=DEFAULT_MAX_CLUSTER_SIZE):
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Método de agrupación desconocido: '{method}' (opciones: {CLUSTER_METHODS})")
+    clusters = []
+    isolated = []
+    for component in connected_components(graph):
+        if len(component) == 1:
+            isolated.extend(component)
+        elif method == "communities" and len(component) > max_cluster_size:
+            for community in label_propagation(graph, component):
+                clusters.extend(bfs_chunks(graph, community, max_cluster_size) if len(community) > max_cluster_size else [community])
+        else:
+            clusters.append(component)
+    # Las colecciones sin relaciones van juntas a un único diagrama en lugar de uno por colección.
+    if isolated:
+        clusters.append(isolated)
+    clusters.sort(key=lambda cluster: (-len(cluster), min(cluster)))
+    return [sorted(cluster) for cluster in clusters]
+
+
+def ego_collections(graph, collection_name, hops=1):
+    # Colecciones a como mucho `hops` relaciones de distancia, en cualquier dirección.
+    center = graph.collections.get(collection_name)
+    if center is None:
+        raise KeyError(f"Colección desconocida en el grafo: '{collection_name}'")
+    distance = {center: 0}
+    queue = deque([center])
+    while queue:
+        collection_id = queue.popleft()
+        if distance[collection_id] == hops:
+            continue
+        for neighbor in _neighbors(graph, collection_id):
+            if neighbor not in distance:
+                distance[neighbor] = distance[collection_id] + 1
+                queue.append(neighbor)
+    return sorted(distance)
+
+
+def ego_graph(graph, collection_name, hops=1):
+    return graph.subgraph(ego_collections(graph, collection_name, hops))
+
+
+def cluster_name(index):
+    return f"cluster{index:03d}"
+
+
+def overview_graph(graph, clusters, links=None):
+    # Índice: un nodo por grupo (con sus primeras colecciones) y una arista por par de grupos con el número de relaciones entre ellos.
+    import pydot
+    cluster_of = {}
+    for index, cluster in enumerate(clusters):
+        for collection_id in cluster:
+            cluster_of[collection_id] = index
+    overview = pydot.Dot(graph_type='digraph', rankdir='LR')
+    for index, cluster in enumerate(clusters):
+        name = cluster_name(index)
+        members = [graph.collections[collection_id] for collection_id in cluster[:OVERVIEW_MEMBERS]]
+        if len(cluster) > OVERVIEW_MEMBERS:
+            members.append(f"... (+{len(cluster) - OVERVIEW_MEMBERS})")
+        label = f"{name}\n{len(cluster)} colecciones\n{'-'*len(name)}\n" + "\n".join(members)
+        attributes = {"label": label, "shape": "box", "style": "filled", "fillcolor": "lightgrey"}
+        if links and index in links:
+            attributes["URL"] = links[index]
+        overview.add_node(pydot.Node(name, **attributes))
+    cross_edges = Counter()
+    for source_id, target_id in zip(graph.edge_sources, graph.edge_targets):
+        source_cluster, target_cluster = cluster_of.get(source_id), cluster_of.get(target_id)
+        if source_cluster is not None and target_cluster is not None and source_cluster != target_cluster:
+            cross_edges[source_cluster, target_cluster] += 1
+    for (source_cluster, target_cluster), count in sorted(cross_edges.items()):
+        overview.add_edge(pydot.Edge(cluster_name(source_cluster), cluster_name(target_cluster), label=f"{count} relaciones"))
+    return overview
@@ -0,0 +1,268 @@
+import hashlib
+import heapq
+import math
+import random
+from bisect import bisect_left
+
+from sampling import merge_reservoirs
+
+OBJECT_ID_SIZE = 12
+DEFAULT_ERROR_RATE = 0.01
+DEFAULT_INITIAL_CAPACITY = 100_000
+DEFAULT_REFERENCE_SAMPLE_SIZE = 1000
+SORT_RUN_RECORDS = 1 << 16
+DEFAULT_MIN_CONFIDENCE = 0.9
+ID_FILTER_KINDS = ("bloom", "sorted")
+
+
+def object_id_bytes(value):
+    if type(value).__name__ == "ObjectId":
+        return value.binary
+    return None
+
+
+def _hash_pair(key):
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.bit_count = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.bit_count / self.capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def _positions(self, hashed):
+        h1, h2 = hashed
+        return ((h1 + i * h2) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(_hash_pair(key)):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains_hashed(self, hashed):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(hashed))
+
+    def __contains__(self, key):
+        return self.contains_hashed(_hash_pair(key))
+
+    def same_shape(self, other):
+        return (self.bit_count, self.hash_count) == (other.bit_count, other.hash_count)
+
+    def merge(self, other):
+        # Unión bit a bit: el mismo filtro que si todas las claves se hubieran añadido a este.
+        size = len(self.bits)
+        self.bits = bytearray((int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")).to_bytes(size, "little"))
+        self.count += other.count
+        return self
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class ScalableBloomFilter:
+    # Cadena de filtros de capacidad creciente: no hace falta conocer el tamaño de la colección de antemano.
+    def __init__(self, initial_capacity=DEFAULT_INITIAL_CAPACITY, error_rate=DEFAULT_ERROR_RATE, growth=2, tightening=0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * self.growth, current.error_rate * self.tightening)
+            self.filters.append(current)
+        current.add(key)
+
+    def contains_hashed(self, hashed):
+        return any(bloom.contains_hashed(hashed) for bloom in self.filters)
+
+    def merge(self, other):
+        # Trozos de una misma colección con la capacidad del total: un único filtro cada uno, que se unen bit a bit.
+        # En otro caso basta con encadenar los filtros, porque la pertenencia ya es "está en alguno".
+        first, second = self.filters[-1], other.filters[0]
+        if len(self.filters) == len(other.filters) == 1 and first.same_shape(second) and first.count + second.count <= first.capacity:
+            first.merge(second)
+        else:
+            self.filters.extend(other.filters)
+        return self
+
+    def __contains__(self, key):
+        return self.contains_hashed(_hash_pair(key))
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(bloom.nbytes for bloom in self.filters)
+
+
+def sorted_run(buffer, start, size):
+    stop = min(len(buffer), start + SORT_RUN_RECORDS * size)
+    records = [bytes(buffer[i:i + size]) for i in range(start, stop, size)]
+    records.sort()
+    return b"".join(records)
+
+
+def iter_records(buffer, size):
+    for i in range(0, len(buffer), size):
+        yield buffer[i:i + size]
+
+
+class SortedIdArray:
+    # Conjunto exacto: un único bytes con registros de 12 bytes ordenados, búsqueda binaria sobre él.
+    def __init__(self, record_size=OBJECT_ID_SIZE):
+        self.record_size = record_size
+        self.pending = bytearray()
+        self.data = b""
+
+    def add(self, key):
+        self.pending += key
+
+    def merge(self, other):
+        self.pending += other.data
+        self.pending += other.pending
+        return self
+
+    def freeze(self):
+        # Ordena por tramos de SORT_RUN_RECORDS y los mezcla en un único buffer: nunca hay un objeto Python por _id,
+        # sólo los de un tramo a la vez. Los tramos se cortan desde el final de `pending` para ir liberándolo.
+        if self.pending:
+            size = self.record_size
+            runs = [self.data] if self.data else []
+            for start in reversed(range(0, len(self.pending), SORT_RUN_RECORDS * size)):
+                runs.append(sorted_run(self.pending, start, size))
+                del self.pending[start:]
+            if len(runs) == 1:
+                self.data = runs[0]
+            else:
+                merged = bytearray()
+                for record in heapq.merge(*(iter_records(run, size) for run in runs)):
+                    merged += record
+                self.data = merged
+        return self
+
+    def __len__(self):
+        return len(self.data) // self.record_size
+
+    def __getitem__(self, index):
+        start = index * self.record_size
+        return self.data[start:start + self.record_size]
+
+    def __contains__(self, key):
+        self.freeze()
+        index = bisect_left(self, key)
+        return index < len(self) and self[index] == key
+
+    @property
+    def nbytes(self):
+        return len(self.data) + len(self.pending)
+
+
+def make_id_filter(kind="bloom", capacity=None, error_rate=DEFAULT_ERROR_RATE):
+    if kind == "bloom":
+        return ScalableBloomFilter(capacity or DEFAULT_INITIAL_CAPACITY, error_rate)
+    if kind == "sorted":
+        return SortedIdArray()
+    raise ValueError(f"Tipo de filtro de _id desconocido: '{kind}' (opciones: {ID_FILTER_KINDS})")
+
+
+class IdFilterBuilder:
+    done = False
+
+    def __init__(self, kind="bloom", capacity=None, error_rate=DEFAULT_ERROR_RATE):
+        self.filter = make_id_filter(kind, capacity, error_rate)
+
+    def add(self, document, fields=None):
+        key = object_id_bytes(document.get("_id"))
+        if key is not None:
+            self.filter.add(key)
+
+    def merge(self, other):
+        self.filter.merge(other.filter)
+        return self
+
+    def result(self):
+        if isinstance(self.filter, SortedIdArray):
+            self.filter.freeze()
+        return self.filter
+
+
+class ReferenceSampler:
+    done = False
+
+    def __init__(self, sample_size=DEFAULT_REFERENCE_SAMPLE_SIZE, seed=None):
+        self.sample_size = sample_size
+        self.rng = random.Random(seed)
+        self.seen = {}
+        self.samples = {}
+
+    def add(self, document, fields=None):
+        for field, value in document.items() if fields is None else fields:
+            if field == "_id":
+                continue
+            key = object_id_bytes(value)
+            if key is None:
+                continue
+            seen = self.seen[field] = self.seen.get(field, 0) + 1
+            sample = self.samples.setdefault(field, [])
+            if len(sample) < self.sample_size:
+                sample.append(key)
+                continue
+            slot = self.rng.randrange(seen)
+            if slot < self.sample_size:
+                sample[slot] = key
+
+    def merge(self, other):
+        for field, seen in other.seen.items():
+            mine = self.seen.get(field, 0)
+            self.samples[field] = merge_reservoirs(self.rng, self.sample_size, self.samples.get(field, ()), mine, other.samples[field], seen)
+            self.seen[field] = mine + seen
+        return self
+
+    def result(self):
+        return self.samples
+
+
+def containment(values, id_filter, min_score=0.0, hashed_values=None):
+    if not values:
+        return 0.0
+    # Corte temprano: en cuanto los fallos hacen imposible alcanzar min_score, el destino queda descartado.
+    # Casi todos los pares (campo, colección) no están relacionados y se resuelven en unos pocos valores.
+    max_misses = int((1 - min_score) * len(values))
+    misses = 0
+    if hashed_values is not None and hasattr(id_filter, "contains_hashed"):
+        checks = (id_filter.contains_hashed(hashed) for hashed in hashed_values)
+    else:
+        checks = (value in id_filter for value in values)
+    for found in checks:
+        if not found:
+            misses += 1
+            if misses > max_misses:
+                return 0.0
+    return (len(values) - misses) / len(values)
+
+
+def find_value_references(id_filters, reference_samples, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    references = []
+    for source_collection_name, samples in reference_samples.items():
+        for field_name, values in samples.items():
+            # Cada valor se hashea una sola vez y se reutiliza contra todos los filtros Bloom.
+            hashed_values = [_hash_pair(value) for value in values]
+            best = None
+            for target_collection_name, id_filter in id_filters.items():
+                if not len(id_filter):
+                    continue
+                score = containment(values, id_filter, min_confidence, hashed_values)
+                if score >= min_confidence and (best is None or score > best[1]):
+                    best = (target_collection_name, score)
+            if best:
+                references.append((best[0], source_collection_name, field_name, best[1]))
+    return references
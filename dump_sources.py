@@ -0,0 +1,296 @@
+import gzip
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+
+from sampling import DEFAULT_MAX_DEPTH, DEFAULT_MAX_WIDTH
+
+BSON_SUFFIXES = (".bson", ".bson.gz")
+JSONL_SUFFIXES = (".jsonl", ".json", ".jsonl.gz", ".json.gz")
+_INT32 = struct.Struct("<i")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+EPOCH = datetime(1970, 1, 1)
+
+
+class ObjectId:
+    # Lo único que la inferencia necesita de un ObjectId son sus 12 bytes (containment.object_id_bytes)
+    # y el nombre del tipo (sampling.type_name): no hace falta pymongo para leer un volcado.
+    __slots__ = ("binary",)
+
+    def __init__(self, binary):
+        self.binary = bytes(binary)
+
+    def __eq__(self, other):
+        return getattr(other, "binary", None) == self.binary
+
+    def __hash__(self):
+        return hash(self.binary)
+
+    def __repr__(self):
+        return f"ObjectId('{self.binary.hex()}')"
+
+
+class TypeMarker:
+    # Sustituye a un valor que la inferencia no necesita: solo conserva el nombre de tipo que daría pymongo al decodificarlo.
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>"
+
+
+class Int64(int):
+    # Mismo nombre de tipo que el Int64 de pymongo: conservar el valor no cambia el esquema inferido.
+    __slots__ = ()
+
+
+class Binary(bytes):
+    # Binario con subtipo distinto de 0, con el nombre de tipo de pymongo.
+    __slots__ = ()
+
+
+def _marker(name):
+    return type(name, (TypeMarker,), {"__slots__": ()})()
+
+
+MARKERS = {name: _marker(name) for name in (
+    "float", "str", "bytes", "Binary", "NoneType", "bool", "datetime", "Regex", "DBRef", "Code",
+    "int", "Timestamp", "Int64", "Decimal128", "MinKey", "MaxKey", "dict", "list",
+)}
+# Tamaño fijo del valor para cada tipo BSON de longitud constante.
+FIXED_SIZES = {0x01: 8, 0x06: 0, 0x07: 12, 0x08: 1, 0x09: 8, 0x0A: 0, 0x10: 4, 0x11: 8, 0x12: 8, 0x13: 16, 0x7F: 0, 0xFF: 0}
+TYPE_MARKERS = {
+    0x01: "float", 0x02: "str", 0x06: "NoneType", 0x08: "bool", 0x09: "datetime", 0x0A: "NoneType", 0x0B: "Regex",
+    0x0C: "DBRef", 0x0D: "Code", 0x0E: "str", 0x0F: "Code", 0x10: "int", 0x11: "Timestamp", 0x12: "Int64",
+    0x13: "Decimal128", 0x7F: "MaxKey", 0xFF: "MinKey",
+}
+
+
+def _scalar(buffer, position, element_type):
+    # Valores de longitud fija que conservan las estadísticas por campo; el resto sigue como marcador de tipo.
+    if element_type == 0x01:
+        return _DOUBLE.unpack_from(buffer, position)[0]
+    if element_type == 0x08:
+        return buffer[position] != 0
+    if element_type == 0x10:
+        return _INT32.unpack_from(buffer, position)[0]
+    if element_type == 0x12:
+        return Int64(_INT64.unpack_from(buffer, position)[0])
+    if element_type == 0x06 or element_type == 0x0A:
+        return None
+    if element_type == 0x09:
+        try:
+            return EPOCH + timedelta(milliseconds=_INT64.unpack_from(buffer, position)[0])
+        except OverflowError:
+            pass
+    return MARKERS[TYPE_MARKERS[element_type]]
+
+
+def decode_document(buffer, offset=0, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, depth=1, as_list=False, keep_values=False):
+    # Decodificador BSON parcial sobre el buffer (mmap o bytes), sin copiar el documento: solo se materializan
+    # las claves, los ObjectId y los subdocumentos/arrays hasta max_depth; el resto de valores se salta por su longitud.
+    # Con keep_values (estadísticas por campo) también se decodifican cadenas, números, fechas y binarios.
+    unpack = _INT32.unpack_from
+    find = buffer.find
+    end = offset + unpack(buffer, offset)[0] - 1
+    position = offset + 4
+    result = [] if as_list else {}
+    count = 0
+    while position < end:
+        element_type = buffer[position]
+        name_end = find(b"\x00", position + 1)
+        keep = count < max_width
+        count += 1
+        key = None if as_list or not keep else buffer[position + 1:name_end].decode("utf-8", "replace")
+        position = name_end + 1
+        fixed_size = FIXED_SIZES.get(element_type)
+        if element_type == 0x07:
+            value = ObjectId(buffer[position:position + 12]) if keep else None
+            position += 12
+        elif fixed_size is not None:
+            value = _scalar(buffer, position, element_type) if keep_values and keep else MARKERS[TYPE_MARKERS[element_type]]
+            position += fixed_size
+        elif element_type == 0x03 or element_type == 0x04:
+            value = None
+            if keep:
+                if depth < max_depth:
+                    value = decode_document(buffer, position, max_depth, max_width, depth + 1, element_type == 0x04, keep_values)
+                else:
+                    value = MARKERS["list" if element_type == 0x04 else "dict"]
+            position += unpack(buffer, position)[0]
+        elif element_type == 0x02 or element_type == 0x0D or element_type == 0x0E:
+            length = unpack(buffer, position)[0]
+            value = MARKERS[TYPE_MARKERS[element_type]]
+            if keep_values and keep and element_type != 0x0D:
+                value = bytes(buffer[position + 4:position + 3 + length]).decode("utf-8", "replace")
+            position += 4 + length
+        elif element_type == 0x05:
+            length = unpack(buffer, position)[0]
+            value = MARKERS["bytes" if buffer[position + 4] == 0 else "Binary"]
+            if keep_values and keep:
+                value = (bytes if buffer[position + 4] == 0 else Binary)(buffer[position + 5:position + 5 + length])
+            position += 5 + length
+        elif element_type == 0x0F:
+            value = MARKERS["Code"]
+            position += unpack(buffer, position)[0]
+        elif element_type == 0x0B:
+            value = MARKERS["Regex"]
+            position = find(b"\x00", find(b"\x00", position) + 1) + 1
+        elif element_type == 0x0C:
+            value = MARKERS["DBRef"]
+            position += 4 + unpack(buffer, position)[0] + 12
+        else:
+            raise ValueError(f"Tipo BSON desconocido 0x{element_type:02x} en la posición {position}")
+        if keep:
+            if as_list:
+                result.append(value)
+            else:
+                result[key] = value
+    return result
+
+
+class BsonFileSource:
+    # Fichero .bson de mongodump: documentos concatenados, cada uno precedido de su longitud (int32 little-endian).
+    # Se proyecta con mmap y se recorre documento a documento: la memoria usada no depende del tamaño del volcado.
+    def __init__(self, path, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, keep_values=False):
+        self.path = path
+        self.max_depth = max_depth
+        self.max_width = max_width
+        self.keep_values = keep_values
+
+    def __iter__(self):
+        if self.path.endswith(".gz"):
+            yield from self._iter_gzip()
+            return
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                offset = 0
+                total = len(buffer)
+                while offset + 4 <= total:
+                    size = _INT32.unpack_from(buffer, offset)[0]
+                    if size < 5 or offset + size > total:
+                        raise ValueError(f"Documento BSON truncado o corrupto en {self.path} (posición {offset})")
+                    yield decode_document(buffer, offset, self.max_depth, self.max_width, keep_values=self.keep_values)
+                    offset += size
+
+    def _iter_gzip(self):
+        # Un .bson.gz no se puede proyectar: se lee en flujo, un documento cada vez.
+        with gzip.open(self.path, "rb") as f:
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    return
+                size = _INT32.unpack(header)[0]
+                document = header + f.read(size - 4)
+                if len(document) != size:
+                    raise ValueError(f"Documento BSON truncado en {self.path}")
+                yield decode_document(document, 0, self.max_depth, self.max_width, keep_values=self.keep_values)
+
+    def schema_marker(self):
+        stat = os.stat(self.path)
+        return [os.path.abspath(self.path), stat.st_size, stat.st_mtime_ns]
+
+
+def _extended_json(document):
+    # Extended JSON (canónico y relajado) -> los mismos tipos que daría pymongo; solo $oid conserva su valor.
+    if len(document) > 2:
+        return document
+    keys = list(document)
+    if not keys or not keys[0].startswith("$"):
+        return document
+    key = keys[0]
+    if key == "$oid":
+        return ObjectId(bytes.fromhex(document[key]))
+    if key == "$date":
+        return MARKERS["datetime"]
+    if key == "$numberLong":
+        return Int64(document[key])
+    if key == "$numberInt":
+        return int(document[key])
+    if key == "$numberDouble":
+        return float(document[key])
+    if key == "$numberDecimal":
+        return MARKERS["Decimal128"]
+    if key == "$binary":
+        subtype = document[key].get("subType", "00") if isinstance(document[key], dict) else document.get("$type", "00")
+        return MARKERS["bytes" if int(subtype, 16) == 0 else "Binary"]
+    if key == "$uuid":
+        return MARKERS["Binary"]
+    if key == "$timestamp":
+        return MARKERS["Timestamp"]
+    if key in ("$regularExpression", "$regex"):
+        return MARKERS["Regex"]
+    if key == "$code":
+        return MARKERS["Code"]
+    if key == "$symbol":
+        return MARKERS["str"]
+    if key == "$minKey":
+        return MARKERS["MinKey"]
+    if key == "$maxKey":
+        return MARKERS["MaxKey"]
+    if key == "$undefined":
+        return MARKERS["NoneType"]
+    if key == "$dbPointer":
+        return MARKERS["DBRef"]
+    return document
+
+
+class JsonLinesSource:
+    # Exportación JSON Lines (un documento Extended JSON por línea, como mongoexport): se lee línea a línea.
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with opener(self.path, "rt", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line, object_hook=_extended_json)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"JSON no válido en {self.path}:{line_number}: {e}") from e
+
+    def schema_marker(self):
+        stat = os.stat(self.path)
+        return [os.path.abspath(self.path), stat.st_size, stat.st_mtime_ns]
+
+
+def _collection_name(file_name, suffixes):
+    for suffix in suffixes:
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)]
+    return None
+
+
+def directory_sources(directory, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, keep_values=False):
+    # Un directorio de mongodump (<colección>.bson[.gz]) o de exportaciones JSONL (<colección>.jsonl/.json[.gz]).
+    sources = {}
+    for file_name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, file_name)
+        if file_name.endswith(".metadata.json") or file_name.startswith("system.") or not os.path.isfile(path):
+            continue
+        name = _collection_name(file_name, BSON_SUFFIXES)
+        if name is not None:
+            sources[name] = BsonFileSource(path, max_depth, max_width, keep_values)
+            continue
+        name = _collection_name(file_name, JSONL_SUFFIXES)
+        if name is not None:
+            sources[name] = JsonLinesSource(path)
+    return sources
+
+
+def file_source(path, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, keep_values=False):
+    file_name = os.path.basename(path)
+    name = _collection_name(file_name, BSON_SUFFIXES)
+    if name is not None:
+        return {name: BsonFileSource(path, max_depth, max_width, keep_values)}
+    name = _collection_name(file_name, JSONL_SUFFIXES)
+    if name is not None:
+        return {name: JsonLinesSource(path)}
+    raise ValueError(f"Formato de fichero no reconocido: {path} (se espera {BSON_SUFFIXES + JSONL_SUFFIXES})")
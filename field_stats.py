@@ -0,0 +1,235 @@
+import csv
+import json
+
+from cardinality import HyperLogLog, SpaceSaving
+from containment import object_id_bytes
+from dump_sources import TypeMarker
+
+DEFAULT_STATS_BATCH_SIZE = 512
+DEFAULT_STATS_PRECISION = 10
+DEFAULT_TOP_K = 5
+TOP_VALUE_LENGTH = 40
+# Tamaño BSON fijo por nombre de tipo (el que da sampling.type_name); también vale para los marcadores de los volcados.
+FIXED_BSON_SIZES = {
+    "float": 8, "bool": 1, "NoneType": 0, "datetime": 8, "ObjectId": 12, "Int64": 8,
+    "Decimal128": 16, "Timestamp": 8, "MinKey": 0, "MaxKey": 0,
+}
+STATS_COLUMNS = ("collection", "field", "present", "presence_rate", "occurrences", "nulls", "null_rate",
+                 "distinct", "min_bytes", "max_bytes", "avg_bytes", "total_bytes", "top_values")
+
+
+def bson_size(value):
+    # Tamaño del valor codificado en BSON (sin el byte de tipo ni la clave), solo para hojas: los subdocumentos y arrays
+    # ya llegan aplanados y sus elementos se miden en su propia ruta. None si no se conoce, p. ej. en los marcadores
+    # de un volcado, que no conservan la longitud de cadenas ni binarios.
+    name = type(value).__name__
+    size = FIXED_BSON_SIZES.get(name)
+    if size is not None:
+        return size
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, int):
+        return 4 if -2**31 <= value < 2**31 else 8
+    if isinstance(value, str):
+        return 5 + len(value.encode("utf-8", "replace"))
+    if isinstance(value, bytes):
+        return 5 + len(value)
+    return None
+
+
+def value_key(value):
+    # Clave para distintos y top-k: solo valores escalares reales (no contenedores ni marcadores de tipo).
+    if isinstance(value, str):
+        return value.encode("utf-8", "replace")
+    binary = object_id_bytes(value)
+    if binary is not None:
+        return binary
+    if value is None or isinstance(value, (dict, list, TypeMarker)):
+        return None
+    if isinstance(value, bytes):
+        return value
+    return repr(value).encode("utf-8", "replace")
+
+
+def display_value(value):
+    binary = object_id_bytes(value)
+    if binary is not None:
+        return binary.hex()
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= TOP_VALUE_LENGTH else text[:TOP_VALUE_LENGTH - 1] + "…"
+
+
+class FieldStatistics:
+    def __init__(self, precision=DEFAULT_STATS_PRECISION, top_k=DEFAULT_TOP_K):
+        self.present = 0
+        self.occurrences = 0
+        self.nulls = 0
+        self.sized = 0
+        self.total_bytes = 0
+        self.min_bytes = None
+        self.max_bytes = None
+        self.hashed = 0
+        self.distinct = HyperLogLog(precision)
+        self.top = SpaceSaving(2 * top_k)
+        self.top_k = top_k
+
+    def add_column(self, values):
+        # Una columna = todos los valores de la ruta en un lote: los agregados se calculan sobre la lista de una vez.
+        self.occurrences += len(values)
+        self.nulls += sum(1 for value in values if value is None or type(value).__name__ == "NoneType")
+        sizes = [size for size in map(bson_size, values) if size is not None]
+        if sizes:
+            self.sized += len(sizes)
+            self.total_bytes += sum(sizes)
+            low, high = min(sizes), max(sizes)
+            self.min_bytes = low if self.min_bytes is None else min(self.min_bytes, low)
+            self.max_bytes = high if self.max_bytes is None else max(self.max_bytes, high)
+        for value in values:
+            key = value_key(value)
+            if key is not None:
+                self.hashed += 1
+                self.distinct.add(key)
+                self.top.add(display_value(value))
+
+    def merge(self, other):
+        self.present += other.present
+        self.occurrences += other.occurrences
+        self.nulls += other.nulls
+        self.sized += other.sized
+        self.total_bytes += other.total_bytes
+        self.hashed += other.hashed
+        for bound, pick in (("min_bytes", min), ("max_bytes", max)):
+            values = [value for value in (getattr(self, bound), getattr(other, bound)) if value is not None]
+            setattr(self, bound, pick(values) if values else None)
+        self.distinct.merge(other.distinct)
+        self.top.merge(other.top)
+        return self
+
+    @property
+    def avg_bytes(self):
+        return self.total_bytes / self.sized if self.sized else None
+
+    @property
+    def distinct_count(self):
+        # None si no llegó ningún valor comparable (contenedores, nulos o marcadores de tipo): se desconoce, no es 0.
+        return round(self.distinct.count()) if self.hashed else None
+
+    def to_dict(self, documents):
+        return {
+            "present": self.present,
+            "presence_rate": round(self.present / documents, 4) if documents else 0.0,
+            "occurrences": self.occurrences,
+            "nulls": self.nulls,
+            "null_rate": round(self.nulls / self.occurrences, 4) if self.occurrences else 0.0,
+            "distinct": self.distinct_count,
+            "min_bytes": self.min_bytes,
+            "max_bytes": self.max_bytes,
+            "avg_bytes": round(self.avg_bytes, 2) if self.avg_bytes is not None else None,
+            "total_bytes": self.total_bytes,
+            "top_values": [[value, frequency] for value, frequency, _ in self.top.top(self.top_k)],
+        }
+
+
+class FieldStatsProfiler:
+    # Consumidor del recorrido único: acumula las rutas ya aplanadas por lotes y las procesa por columnas.
+    # Con muestreo "first" se detiene en `limit` documentos, como el esquema; sin límite recorre toda la colección.
+    def __init__(self, limit=None, batch_size=DEFAULT_STATS_BATCH_SIZE, precision=DEFAULT_STATS_PRECISION, top_k=DEFAULT_TOP_K):
+        self.limit = limit
+        self.batch_size = batch_size
+        self.precision = precision
+        self.top_k = top_k
+        self.documents = 0
+        self.batch = []
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self.limit is not None and self.documents >= self.limit
+
+    def add(self, document, fields=None):
+        if self.done:
+            return
+        self.documents += 1
+        self.batch.append(list(document.items()) if fields is None else fields)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        columns = {}
+        presence = {}
+        for fields in self.batch:
+            for path, value in fields:
+                columns.setdefault(path, []).append(value)
+            for path in {path for path, _ in fields}:
+                presence[path] = presence.get(path, 0) + 1
+        for path, values in columns.items():
+            stats = self.fields.get(path)
+            if stats is None:
+                stats = self.fields[path] = FieldStatistics(self.precision, self.top_k)
+            stats.present += presence[path]
+            stats.add_column(values)
+        self.batch = []
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.documents += other.documents
+        for path, stats in other.fields.items():
+            mine = self.fields.get(path)
+            if mine is None:
+                self.fields[path] = stats
+            else:
+                mine.merge(stats)
+        return self
+
+    def result(self):
+        self.flush()
+        return CollectionFieldStats(self.documents, self.fields)
+
+
+class CollectionFieldStats:
+    def __init__(self, documents, fields):
+        self.documents = documents
+        self.fields = fields
+
+    def get(self, field):
+        return self.fields.get(field)
+
+    def summary(self, field):
+        # Resumen corto para la etiqueta del nodo: presencia, nulos, distintos aproximados y tamaño medio.
+        stats = self.fields.get(field)
+        if stats is None or not self.documents:
+            return ""
+        parts = [f"{stats.present / self.documents:.0%}"]
+        if stats.nulls:
+            parts.append(f"{stats.nulls / stats.occurrences:.0%} nulos")
+        if stats.distinct_count:
+            parts.append(f"~{stats.distinct_count} dist.")
+        if stats.avg_bytes is not None:
+            parts.append(f"{stats.avg_bytes:.0f} B")
+        return " · ".join(parts)
+
+    def to_dict(self):
+        return {field: stats.to_dict(self.documents) for field, stats in self.fields.items()}
+
+
+def field_stats_rows(profiles):
+    for collection_name, profile in profiles.items():
+        if profile.field_stats is None:
+            continue
+        for field, row in profile.field_stats.to_dict().items():
+            yield {"collection": collection_name, "field": field, **row}
+
+
+def export_field_stats(profiles, path):
+    rows = list(field_stats_rows(profiles))
+    if path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=STATS_COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, "top_values": json.dumps(row["top_values"], ensure_ascii=False)})
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    return path
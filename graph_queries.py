@@ -0,0 +1,194 @@
+from array import array
+from collections import deque
+
+from schema_graph import CARDINALITIES
+
+
+def strongly_connected_components(graph, neighbors=None):
+    # Tarjan iterativo: la pila explícita evita el límite de recursión en esquemas con miles de colecciones.
+    # Devuelve (componente de cada nodo, componentes) con las componentes en orden topológico inverso.
+    neighbors = neighbors or graph.successors
+    node_count = graph.collection_count
+    index = array("i", [-1]) * node_count
+    lowlink = array("i", [0]) * node_count
+    on_stack = bytearray(node_count)
+    component_of = array("i", [-1]) * node_count
+    components = []
+    stack = []
+    counter = 0
+    for root in range(node_count):
+        if index[root] != -1:
+            continue
+        work = [(root, iter(neighbors(root)))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if index[successor] == -1:
+                    index[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = 1
+                    work.append((successor, iter(neighbors(successor))))
+                    break
+                if on_stack[successor] and index[successor] < lowlink[node]:
+                    lowlink[node] = index[successor]
+            else:
+                work.pop()
+                if work and lowlink[node] < lowlink[work[-1][0]]:
+                    lowlink[work[-1][0]] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component_of[member] = len(components)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return component_of, components
+
+
+class SchemaQueries:
+    # Índice precalculado sobre un SchemaGraph ya construido: componentes fuertemente conexas, su DAG condensado
+    # y el cierre transitivo de cada componente como máscara de bits (un int). Las consultas repetidas no recorren el grafo.
+    # Las aristas van de la colección referenciada a la que la referencia: los "dependientes" de users son quienes la usan.
+    def __init__(self, graph):
+        self.graph = graph
+        self.out_steps, self.in_steps = self._dependency_steps()
+        self.successors = [[neighbor for neighbor, _ in steps] for steps in self.out_steps]
+        self.predecessors = [[neighbor for neighbor, _ in steps] for steps in self.in_steps]
+        self.component_of, self.components = strongly_connected_components(graph, self.successors.__getitem__)
+        self.self_loops = {node for node, successors in enumerate(self.successors) if node in successors}
+        self.descendants = self._closure(reverse=False)
+        self.ancestors = self._closure(reverse=True)
+
+    def _dependency_steps(self):
+        # Dependencias reales por colección: (vecina, relación). Una arista N:M no hace depender un extremo del otro
+        # (su sentido es arbitrario): se expande en las dos referencias de la intermedia oculta hacia cada extremo.
+        # Una N:M sin intermedia conocida no aporta dependencias.
+        graph = self.graph
+        out_steps = [[] for _ in range(graph.collection_count)]
+        in_steps = [[] for _ in range(graph.collection_count)]
+        for edge_id in range(graph.edge_count):
+            source_id, target_id = graph.edge_sources[edge_id], graph.edge_targets[edge_id]
+            join = graph.edge_join(edge_id)
+            if join is not None:
+                join_id = graph.edge_joins[edge_id]
+                join_name, source_field, target_field = join
+                steps = [
+                    (source_id, join_id, (graph.collections[source_id], join_name, "1:N", source_field, None)),
+                    (target_id, join_id, (graph.collections[target_id], join_name, "1:N", target_field, None)),
+                ]
+            elif graph.edge_cardinalities[edge_id] == CARDINALITIES.index("N:M"):
+                continue
+            else:
+                steps = [(source_id, target_id, graph.edge(edge_id))]
+            for referenced, referencing, relation in steps:
+                out_steps[referenced].append((referencing, relation))
+                in_steps[referencing].append((referenced, relation))
+        return out_steps, in_steps
+
+    def _closure(self, reverse):
+        component_of = self.component_of
+        neighbors = self.predecessors if reverse else self.successors
+        # Tarjan emite las componentes en orden topológico inverso: cada sucesor ya está resuelto al llegar a su origen.
+        order = reversed(range(len(self.components))) if reverse else range(len(self.components))
+        closure = [0] * len(self.components)
+        for component_id in order:
+            mask = 1 << component_id
+            for member in self.components[component_id]:
+                for neighbor in neighbors[member]:
+                    other = component_of[neighbor]
+                    if other != component_id:
+                        mask |= closure[other]
+            closure[component_id] = mask
+        return closure
+
+    def _id(self, collection_name):
+        collection_id = self.graph.collections.get(collection_name)
+        if collection_id is None:
+            raise KeyError(f"Colección desconocida en el grafo: '{collection_name}'")
+        return collection_id
+
+    def _members(self, mask, exclude=None):
+        names = []
+        while mask:
+            low = mask & -mask
+            for member in self.components[low.bit_length() - 1]:
+                if member != exclude or self.is_cyclic(member):
+                    names.append(self.graph.collections[member])
+            mask ^= low
+        return sorted(names)
+
+    def is_cyclic(self, collection_id):
+        return len(self.components[self.component_of[collection_id]]) > 1 or collection_id in self.self_loops
+
+    def reachable(self, source, target):
+        source_id, target_id = self._id(source), self._id(target)
+        if source_id == target_id:
+            return self.is_cyclic(source_id)
+        return bool(self.descendants[self.component_of[source_id]] >> self.component_of[target_id] & 1)
+
+    def dependents(self, collection_name):
+        # Todo lo que se ve afectado, directa o transitivamente, si cambia esta colección.
+        collection_id = self._id(collection_name)
+        return self._members(self.descendants[self.component_of[collection_id]], exclude=collection_id)
+
+    def dependencies(self, collection_name):
+        collection_id = self._id(collection_name)
+        return self._members(self.ancestors[self.component_of[collection_id]], exclude=collection_id)
+
+    def cycles(self):
+        cyclic = [component for component in self.components if len(component) > 1 or component[0] in self.self_loops]
+        return sorted(sorted(self.graph.collections[member] for member in component) for component in cyclic)
+
+    def has_cycles(self):
+        return bool(self.self_loops) or any(len(component) > 1 for component in self.components)
+
+    def topological_order(self, strict=False):
+        # Orden de migración: cada colección después de las que referencia. Las colecciones de un ciclo quedan juntas;
+        # las intermedias N:M van al final, cuando ya existen los dos extremos.
+        if strict and self.has_cycles():
+            raise ValueError(f"El esquema tiene referencias circulares, no existe un orden topológico: {self.cycles()}")
+        hidden = self.graph.hidden
+        order = []
+        for component in reversed(self.components):
+            order.extend(sorted(self.graph.collections[member] for member in component if not hidden[member]))
+        order.extend(self.graph.join_collections)
+        return order
+
+    def shortest_path(self, source, target, directed=True):
+        # BFS; devuelve las relaciones (origen, destino, cardinalidad, campo, confianza) del camino. Dirigido sigue las
+        # dependencias (las N:M pasan por su intermedia); sin dirigir, cualquier arista del grafo une a sus dos extremos.
+        graph = self.graph
+        source_id, target_id = self._id(source), self._id(target)
+        if source_id == target_id:
+            return []
+        if directed and not self.reachable(source, target):
+            return None
+        previous_step = {source_id: None}
+        queue = deque([source_id])
+        while queue:
+            node = queue.popleft()
+            if directed:
+                steps = self.out_steps[node]
+            else:
+                steps = [(graph.edge_targets[edge_id], graph.edge(edge_id)) for edge_id in graph.out_edges(node)]
+                steps += [(graph.edge_sources[edge_id], graph.edge(edge_id)) for edge_id in graph.in_edges(node)]
+            for neighbor, relation in steps:
+                if neighbor in previous_step:
+                    continue
+                previous_step[neighbor] = (relation, node)
+                if neighbor == target_id:
+                    path = []
+                    while previous_step[neighbor] is not None:
+                        relation, neighbor = previous_step[neighbor]
+                        path.append(relation)
+                    return path[::-1]
+                queue.append(neighbor)
+        return None
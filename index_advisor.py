@@ -0,0 +1,197 @@
+import json
+import logging
+import math
+import os
+
+from schema_graph import UNINDEXED
+
+logger = logging.getLogger("grafos.index_advisor")
+
+METADATA_SUFFIX = ".metadata.json"
+# Tipos de índice que sirven para buscar por igualdad (lo que hace un $lookup o un find por clave ajena).
+EQUALITY_INDEX_TYPES = (1, -1, "hashed")
+
+
+def index_path(field):
+    # Ruta aplanada del muestreo -> ruta de índice de MongoDB: "items[].product_id" -> "items.product_id" (índice multiclave).
+    return field.replace("[]", "")
+
+
+def _index_direction(value):
+    # En los metadatos de mongodump las direcciones vienen en Extended JSON: {"$numberInt": "1"}.
+    if isinstance(value, dict) and len(value) == 1:
+        value = next(iter(value.values()))
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return value
+
+
+class IndexCatalog:
+    # Índices por colección como tuplas de (ruta, dirección) en orden, y número de documentos si el origen lo conoce.
+    def __init__(self, indexes=None, counts=None, origin="declarado"):
+        self.indexes = {name: [tuple(keys) for keys in key_lists] for name, key_lists in (indexes or {}).items()}
+        self.counts = counts or {}
+        self.origin = origin
+
+    def supports(self, collection_name, field):
+        # Un índice sirve a la búsqueda si el campo es su primera clave (prefijo). _id siempre tiene índice.
+        path = index_path(field)
+        if path == "_id":
+            return True
+        return any(keys and keys[0][0] == path and keys[0][1] in EQUALITY_INDEX_TYPES for keys in self.indexes.get(collection_name, ()))
+
+    def __repr__(self):
+        return f"IndexCatalog({len(self.indexes)} colecciones, {sum(map(len, self.indexes.values()))} índices, {self.origin})"
+
+
+def catalog_from_database(database, collection_names=None):
+    if collection_names is None:
+        collection_names = sorted(name for name in database.list_collection_names() if not name.startswith("system."))
+    indexes = {}
+    counts = {}
+    for name in collection_names:
+        collection = database[name]
+        indexes[name] = [index["key"] for index in collection.index_information().values()]
+        counts[name] = collection.estimated_document_count()
+    return IndexCatalog(indexes, counts, origin="servidor")
+
+
+def catalog_from_dump(path):
+    # mongodump escribe junto a cada <colección>.bson un <colección>.metadata.json con la definición de sus índices.
+    directory = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    indexes = {}
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith(METADATA_SUFFIX):
+            continue
+        with open(os.path.join(directory, file_name), encoding="utf-8") as f:
+            try:
+                metadata = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.warning("⚠️ Metadatos no válidos en %s: %s", file_name, e)
+                continue
+        indexes[file_name[:-len(METADATA_SUFFIX)]] = [
+            [(key, _index_direction(direction)) for key, direction in index.get("key", {}).items()]
+            for index in metadata.get("indexes", ())
+        ]
+    if not indexes:
+        logger.warning("⚠️ No hay ficheros %s en %s: solo se supondrá el índice de _id.", METADATA_SUFFIX, directory)
+    return IndexCatalog(indexes, origin="volcado")
+
+
+def read_index_catalog(source):
+    # Mismos orígenes que Grafos.resolve_source: ruta de un volcado, base de datos de pymongo,
+    # o un dict {colección: [claves de cada índice]} (p. ej. {} para los datos de ejemplo, sin índices declarados).
+    if isinstance(source, IndexCatalog):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return catalog_from_dump(os.fspath(source))
+    if hasattr(source, "list_collection_names"):
+        return catalog_from_database(source)
+    if hasattr(source, "items"):
+        return IndexCatalog({name: [list(keys.items()) if hasattr(keys, "items") else keys for keys in key_lists] for name, key_lists in source.items()})
+    raise TypeError(f"Origen de índices no soportado: {type(source).__name__}")
+
+
+class MissingIndex:
+    __slots__ = ("collection", "field", "referenced", "edge_id", "documents", "referenced_documents")
+
+    def __init__(self, collection, field, referenced, edge_id, documents, referenced_documents):
+        self.collection = collection
+        self.field = field
+        self.referenced = referenced
+        self.edge_id = edge_id
+        self.documents = documents
+        self.referenced_documents = referenced_documents
+
+    @property
+    def scan_cost(self):
+        # Un $lookup desde cada documento referenciado recorre la colección entera: n(referenciada) * n(colección).
+        return self.referenced_documents * self.documents
+
+    @property
+    def indexed_cost(self):
+        # Con índice, cada búsqueda baja por un árbol B: ~log2(n) claves por documento referenciado.
+        return self.referenced_documents * max(1, math.ceil(math.log2(self.documents + 1)))
+
+    @property
+    def suggestion(self):
+        collection = f"db.{self.collection}" if self.collection.isidentifier() else f"db.getCollection({json.dumps(self.collection)})"
+        return f"{collection}.createIndex({{{json.dumps(index_path(self.field))}: 1}})"
+
+    def to_dict(self):
+        return {
+            "collection": self.collection, "field": self.field, "referenced": self.referenced,
+            "documents": self.documents, "referenced_documents": self.referenced_documents,
+            "scan_cost": self.scan_cost, "indexed_cost": self.indexed_cost, "suggestion": self.suggestion,
+        }
+
+
+class IndexReport:
+    def __init__(self, catalog, missing, checked):
+        self.catalog = catalog
+        self.missing = missing
+        self.checked = checked
+
+    def __bool__(self):
+        return bool(self.missing)
+
+    def to_dict(self):
+        return {
+            "origin": self.catalog.origin,
+            "checked_fields": self.checked,
+            "missing_indexes": [finding.to_dict() for finding in self.missing],
+        }
+
+    def format_text(self):
+        if not self.missing:
+            return f"✅ Las {self.checked} claves ajenas detectadas tienen índice."
+        lines = [f"⚠️ {len(self.missing)} de {self.checked} claves ajenas sin índice (de más a menos coste):"]
+        for finding in self.missing:
+            lines.append(
+                f"  {finding.collection}.{finding.field} -> {finding.referenced}: ~{finding.scan_cost:,} documentos examinados "
+                f"por un $lookup completo (~{finding.indexed_cost:,} con índice)  {finding.suggestion}"
+            )
+        return "\n".join(lines)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+def _edge_references(graph, edge_id):
+    # (colección con la clave ajena, campo, colección referenciada) de cada arista. En una arista N:M las claves
+    # están en la colección intermedia, una hacia cada extremo.
+    referenced, referencing, cardinality, field, _ = graph.edge(edge_id)
+    join = graph.edge_join(edge_id)
+    if join is not None:
+        join_name, source_field, target_field = join
+        return [(join_name, source_field, referenced), (join_name, target_field, referencing)]
+    if cardinality == "N:M":
+        # Sin intermedia conocida (grafo construido a mano) no hay ninguna clave que comprobar.
+        return []
+    return [(referencing, field, referenced)]
+
+
+def advise_indexes(graph, catalog, mark=True):
+    # Cruza las relaciones del grafo con los índices: cada clave ajena sin índice que empiece por ella es un hallazgo.
+    # El coste usa el número de documentos del servidor si se conoce y, si no, los documentos vistos al muestrear.
+    counts = {name: catalog.counts.get(name, graph.documents[collection_id]) for collection_id, name in enumerate(graph.collections)}
+    found = {}
+    checked = set()
+    for edge_id in range(graph.edge_count):
+        for collection, field, referenced in _edge_references(graph, edge_id):
+            checked.add((collection, field))
+            if catalog.supports(collection, field):
+                continue
+            if (collection, field) not in found:
+                found[collection, field] = MissingIndex(collection, field, referenced, edge_id, counts.get(collection, 0), counts.get(referenced, 0))
+            if mark:
+                graph.edge_flags[edge_id] |= UNINDEXED
+    missing = list(found.values())
+    missing.sort(key=lambda finding: (-finding.scan_cost, finding.collection, finding.field))
+    report = IndexReport(catalog, missing, len(checked))
+    for finding in missing:
+        logger.warning("⚠️ Sin índice: %s.%s (referencia a %s). Sugerencia: %s", finding.collection, finding.field, finding.referenced, finding.suggestion)
+    return report
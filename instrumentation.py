@@ -0,0 +1,97 @@
+import io
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+ROOT_LOGGER = "grafos"
+MESSAGE_FORMAT = "%(message)s"
+DEBUG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+logger = logging.getLogger(f"{ROOT_LOGGER}.instrumentation")
+# Sin configuración explícita la biblioteca no escribe nada por debajo de WARNING.
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+
+def configure_logging(level=logging.INFO, stream=None, fmt=None):
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in [h for h in root.handlers if getattr(h, "_grafos_handler", False)]:
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(fmt or (DEBUG_FORMAT if level <= logging.DEBUG else MESSAGE_FORMAT)))
+    handler._grafos_handler = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    return root
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = Counter()
+        self.collections = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            logger.debug("Etapa '%s': %.4f s", name, elapsed)
+
+    def count(self, name, value=1, collection=None):
+        with self.lock:
+            if collection is None:
+                self.counters[name] += value
+            else:
+                self.collections.setdefault(collection, Counter())[name] += value
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "timings": {name: round(seconds, 6) for name, seconds in self.timings.items()},
+                "counters": dict(self.counters),
+                "collections": {name: dict(counter) for name, counter in self.collections.items()},
+            }
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+class NullMetrics:
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def count(self, name, value=1, collection=None):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+@contextmanager
+def profiled(output_path=None, top=25):
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output_path:
+            profiler.dump_stats(output_path)
+            logger.info("Perfil de cProfile guardado en %s", output_path)
+        else:
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+            logger.info("%s", buffer.getvalue())
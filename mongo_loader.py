@@ -0,0 +1,228 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from cardinality import CardinalityProfiler
+from containment import DEFAULT_REFERENCE_SAMPLE_SIZE
+from field_stats import DEFAULT_TOP_K
+from profiling import CollectionProfile, CollectionProfiler
+from sampling import DEFAULT_MAX_DEPTH, DEFAULT_MAX_WIDTH, DEFAULT_SAMPLE_SIZE, CollectionSchema, document_signature, flatten_document
+
+DEFAULT_MAX_WORKERS = 8
+
+logger = logging.getLogger("grafos.mongo_loader")
+
+# Nombres que devuelve el operador $type del servidor -> nombres que usaría type(value).__name__ al decodificar con pymongo.
+BSON_TYPE_NAMES = {
+    "double": "float",
+    "string": "str",
+    "object": "dict",
+    "array": "list",
+    "binData": "bytes",
+    "undefined": "NoneType",
+    "objectId": "ObjectId",
+    "bool": "bool",
+    "date": "datetime",
+    "null": "NoneType",
+    "regex": "Regex",
+    "dbPointer": "DBRef",
+    "javascript": "Code",
+    "symbol": "str",
+    "javascriptWithScope": "Code",
+    "int": "int",
+    "timestamp": "Timestamp",
+    "long": "Int64",
+    "decimal": "Decimal128",
+    "minKey": "MinKey",
+    "maxKey": "MaxKey",
+}
+
+
+def connect(uri="mongodb://localhost:27017", max_pool_size=DEFAULT_MAX_WORKERS, **kwargs):
+    from pymongo import MongoClient
+    return MongoClient(uri, maxPoolSize=max_pool_size, **kwargs)
+
+
+def sampling_stage(sample_size, strategy="first"):
+    if strategy == "reservoir":
+        return {"$sample": {"size": sample_size}}
+    return {"$limit": sample_size}
+
+
+def _typed_children(value, depth, max_depth, max_width):
+    # Claves de un subdocumento o elementos de un array como {k, t, c}: nombre, tipo $type e hijos. La expresión se
+    # despliega aquí hasta max_depth (el servidor no admite recursión), con los mismos límites que flatten_document;
+    # ambos casos se reducen primero a pares {k, v} para que cada nivel aparezca una sola vez en la expresión.
+    if depth > max_depth:
+        return []
+    field, element = f"f{depth}", f"e{depth}"
+    items = {"$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": value}, "object"]}, "then": {"$slice": [{"$objectToArray": value}, max_width]}},
+            {"case": {"$eq": [{"$type": value}, "array"]}, "then": {"$map": {
+                "input": {"$slice": [value, max_width]}, "as": element, "in": {"k": "[]", "v": f"$${element}"},
+            }}},
+        ],
+        "default": [],
+    }}
+    return {"$map": {
+        "input": items,
+        "as": field,
+        "in": {"k": f"$${field}.k", "t": {"$type": f"$${field}.v"}, "c": _typed_children(f"$${field}.v", depth + 1, max_depth, max_width)},
+    }}
+
+
+def field_types_pipeline(sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH):
+    # Solo viajan los nombres y los tipos de cada documento muestreado, nunca los valores.
+    return [
+        sampling_stage(sample_size, strategy),
+        {"$project": {"_id": 0, "fields": _typed_children("$$ROOT", 1, max_depth, max_width)}},
+    ]
+
+
+def typed_signature(fields):
+    # Árbol {k, t, c} de field_types_pipeline -> la misma firma (ruta, tipo) que document_signature sobre el documento.
+    signature = []
+    stack = [(iter(fields), "")]
+    while stack:
+        items, prefix = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        key = item["k"]
+        path = f"{prefix}{key}" if key == "[]" or not prefix else f"{prefix}.{key}"
+        signature.append((path, BSON_TYPE_NAMES.get(item["t"], item["t"])))
+        if item["c"]:
+            stack.append((iter(item["c"]), path))
+    return tuple(dict.fromkeys(signature))
+
+
+def sample_collection_schema(collection, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH):
+    from pymongo.errors import OperationFailure
+    schema = CollectionSchema()
+    try:
+        for row in collection.aggregate(field_types_pipeline(sample_size, strategy, max_depth, max_width)):
+            schema.add_signature(typed_signature(row["fields"]))
+    except (OperationFailure, NotImplementedError) as e:
+        # Servidores (o sustitutos como mongomock) sin soporte de $type en expresiones: se tipan los documentos en el cliente.
+        logger.warning("⚠️ '%s': el servidor no admite la proyección de tipos (%s); se tipará en el cliente.", collection.name, e)
+        schema = CollectionSchema()
+        for document in collection.aggregate([sampling_stage(sample_size, strategy)]):
+            schema.add_signature(document_signature(document, max_depth, max_width))
+    schema.seen = collection.estimated_document_count()
+    return schema
+
+
+def reference_projection(schema):
+    # Para la cardinalidad y el modo por valores: solo viajan _id y los campos que el muestreo vio como ObjectId
+    # ("items[].product_id" -> "items.product_id"). Una ruta dentro de otra ya proyectada chocaría en el servidor.
+    projection = {"_id": 1}
+    for path in sorted({field.replace("[]", "") for field in schema.field_types if schema.has_type(field, "ObjectId")}):
+        if not any(path == kept or path.startswith(f"{kept}.") for kept in projection):
+            projection[path] = 1
+    return projection
+
+
+def load_schemas(database, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", collection_names=None, max_workers=DEFAULT_MAX_WORKERS, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH):
+    if collection_names is None:
+        collection_names = sorted(name for name in database.list_collection_names() if not name.startswith("system."))
+    logger.info("--- Muestreando %d colecciones de '%s' en el servidor ---", len(collection_names), database.name)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(sample_collection_schema, database[name], sample_size, strategy, max_depth, max_width)
+            for name in collection_names
+        }
+        db_data = {name: futures[name].result() for name in collection_names}
+    for name, schema in db_data.items():
+        logger.info("Colección '%s': %d documentos muestreados de ~%d, %d campos.", name, schema.sampled, schema.seen, len(schema.field_types))
+    return db_data
+
+
+class CollectionSource:
+    # Colección viva como origen de documentos: se recorre con un cursor y expone una marca barata para la caché.
+    def __init__(self, collection, projection=None, batch_size=10_000, exact_marker=False):
+        self.collection = collection
+        self.projection = projection
+        self.batch_size = batch_size
+        self.exact_marker = exact_marker
+
+    def __iter__(self):
+        return iter(self.collection.find({}, self.projection, batch_size=self.batch_size))
+
+    def profile(self, collection_name, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None, with_values=False,
+                id_filter_kind="bloom", reference_sample_size=DEFAULT_REFERENCE_SAMPLE_SIZE, with_cardinality=False,
+                max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, with_stats=False, stats_top_k=DEFAULT_TOP_K):
+        # El muestreo ($sample o $limit) se hace en el servidor: solo viajan sample_size documentos y, salvo que haga falta
+        # estadística por campo, solo sus nombres y tipos. La cardinalidad usa otra muestra proyectada a las referencias;
+        # el modo por valores sí recorre la colección entera, pero también proyectada. Una muestra solo cuenta como
+        # recorrido completo (y permite etiquetar 1:1) si el servidor devolvió menos documentos de los pedidos.
+        sampling = sampling_stage(sample_size, strategy)
+        sample_cardinality = with_cardinality and not with_values
+        if with_stats:
+            profiler = CollectionProfiler(collection_name, sample_size, "first", seed, with_cardinality=sample_cardinality,
+                                          max_depth=max_depth, max_width=max_width, with_stats=True, stats_top_k=stats_top_k)
+            for document in self.collection.aggregate(self._pipeline(sampling, self.projection), batchSize=self.batch_size):
+                profiler.add(document)
+            profile = profiler.result(complete=not profiler.schema_sampler.done)
+            profile.schema.seen = self.collection.estimated_document_count()
+        else:
+            profile = CollectionProfile(collection_name, sample_collection_schema(self.collection, sample_size, strategy, max_depth, max_width))
+            if sample_cardinality:
+                cardinality = CardinalityProfiler()
+                pipeline = self._pipeline(sampling, self.projection or reference_projection(profile.schema))
+                for document in self.collection.aggregate(pipeline, batchSize=self.batch_size):
+                    cardinality.add(document, flatten_document(document, max_depth, max_width))
+                profile.field_cardinality = cardinality.result(complete=cardinality.documents < sample_size)
+        if with_values:
+            # Sin muestra de esquema (ya está hecha): solo los filtros de _id, las referencias y, si se pide, la cardinalidad.
+            profiler = CollectionProfiler(collection_name, 0, "first", seed, True, id_filter_kind, reference_sample_size,
+                                          with_cardinality, max_depth, max_width, capacity=profile.schema.seen)
+            projection = self.projection or reference_projection(profile.schema)
+            for document in self.collection.find({}, projection, batch_size=self.batch_size):
+                profiler.add(document)
+            values = profiler.result(complete=True)
+            profile.id_filter = values.id_filter
+            profile.reference_samples = values.reference_samples
+            if with_cardinality:
+                profile.field_cardinality = values.field_cardinality
+        return profile
+
+    @staticmethod
+    def _pipeline(sampling, projection):
+        return [sampling, {"$project": projection}] if projection else [sampling]
+
+    def schema_marker(self):
+        # Marca barata para la caché: número de documentos y tamaño de datos según los metadatos del motor ($collStats,
+        # una fila por shard) más el último _id. Detecta inserciones, borrados y casi todas las actualizaciones que cambian
+        # el tamaño, sin leer la colección. exact_marker=True usa dbHash: detecta cualquier cambio, pero lee la colección
+        # entera en el servidor y bloquea las escrituras de la base de datos mientras tanto.
+        from pymongo.errors import PyMongoError
+        name = self.collection.full_name
+        if self.exact_marker:
+            try:
+                result = self.collection.database.command("dbHash", collections=[self.collection.name])
+                return [name, "dbHash", result["collections"].get(self.collection.name)]
+            except (PyMongoError, NotImplementedError) as e:
+                logger.warning("⚠️ dbHash no disponible para '%s' (%s): se usa la marca por metadatos.", name, e)
+        try:
+            shards = [row.get("storageStats", {}) for row in self.collection.aggregate([{"$collStats": {"storageStats": {}}}])]
+            count, size = sum(stats.get("count", 0) for stats in shards), sum(stats.get("size", 0) for stats in shards)
+        except (PyMongoError, NotImplementedError) as e:
+            logger.debug("$collStats no disponible para '%s' (%s): la caché solo detectará inserciones y borrados.", name, e)
+            count, size = self.collection.estimated_document_count(), None
+        newest = self.collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return [name, count, size, repr(newest["_id"]) if newest else None]
+
+
+def collection_sources(database, collection_names=None, projection=None, exact_marker=False):
+    if collection_names is None:
+        collection_names = sorted(name for name in database.list_collection_names() if not name.startswith("system."))
+    return {name: CollectionSource(database[name], projection, exact_marker=exact_marker) for name in collection_names}
+
+
+def load_db_data(uri, database_name, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", max_workers=DEFAULT_MAX_WORKERS):
+    client = connect(uri, max_pool_size=max_workers)
+    try:
+        return load_schemas(client[database_name], sample_size, strategy, max_workers=max_workers)
+    finally:
+        client.close()
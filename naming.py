@@ -0,0 +1,136 @@
+import re
+
+IRREGULAR_PLURALS = {
+    "person": "people",
+    "child": "children",
+    "man": "men",
+    "woman": "women",
+    "mouse": "mice",
+    "goose": "geese",
+    "foot": "feet",
+    "tooth": "teeth",
+    "ox": "oxen",
+    "datum": "data",
+    "medium": "media",
+    "criterion": "criteria",
+    "analysis": "analyses",
+    "index": "indices",
+    "matrix": "matrices",
+    "vertex": "vertices",
+}
+IRREGULAR_SINGULARS = {plural: singular for singular, plural in IRREGULAR_PLURALS.items()}
+
+# Campos que habitualmente apuntan a otra colección con un nombre distinto. Solo se usan si no hay coincidencia directa.
+DEFAULT_ALIASES = {
+    "seller": "user",
+    "buyer": "user",
+    "author": "user",
+    "owner": "user",
+    "creator": "user",
+    "customer": "user",
+}
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name):
+    return _SEPARATORS.sub("", _CAMEL_BOUNDARY.sub("_", name).lower())
+
+
+def singular_forms(word):
+    if word in IRREGULAR_SINGULARS:
+        return [IRREGULAR_SINGULARS[word]]
+    forms = []
+    if word.endswith("ies") and len(word) > 4:
+        forms.append(word[:-3] + "y")
+    elif word.endswith("ves") and len(word) > 4:
+        forms.extend([word[:-3] + "f", word[:-3] + "fe"])
+    elif word.endswith(("ses", "xes", "zes", "ches", "shes")):
+        forms.append(word[:-2])
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 2:
+        forms.append(word[:-1])
+    return forms
+
+
+def split_reference_field(field_name):
+    name = field_name.rsplit(".", 1)[-1].replace("[]", "")
+    for suffix in ("_id", "Id", "_ids", "Ids"):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def _deletes(key):
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def edit_distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CollectionNameIndex:
+    def __init__(self, collection_names, aliases=None, fuzzy=True, min_fuzzy_length=4):
+        self.aliases = {normalize_name(k): v for k, v in (DEFAULT_ALIASES if aliases is None else aliases).items()}
+        self.fuzzy = fuzzy
+        self.min_fuzzy_length = min_fuzzy_length
+        self.exact = {}
+        self.deletes = {}
+        # Orden fijo: ante nombres que colisionan gana siempre el mismo, sin depender del orden del diccionario.
+        for collection_name in sorted(collection_names):
+            key = normalize_name(collection_name)
+            self.exact.setdefault(key, collection_name)
+        for collection_name in sorted(collection_names):
+            for singular in singular_forms(normalize_name(collection_name)):
+                self.exact.setdefault(singular, collection_name)
+        if fuzzy:
+            for key in self.exact:
+                if len(key) >= min_fuzzy_length:
+                    for deleted in _deletes(key):
+                        self.deletes.setdefault(deleted, set()).add(key)
+
+    def lookup_key(self, key):
+        if key in self.exact:
+            return self.exact[key]
+        for singular in singular_forms(key):
+            if singular in self.exact:
+                return self.exact[singular]
+        return None
+
+    def fuzzy_lookup(self, key):
+        if not self.fuzzy or len(key) < self.min_fuzzy_length:
+            return None
+        # Vecindario de borrados (estilo SymSpell): candidatos a distancia 1 sin recorrer todos los nombres.
+        candidates = set(self.deletes.get(key, ()))
+        for deleted in _deletes(key):
+            if deleted in self.exact:
+                candidates.add(deleted)
+            candidates.update(self.deletes.get(deleted, ()))
+        matches = sorted(candidate for candidate in candidates if edit_distance(key, candidate, 1) <= 1)
+        return self.exact[matches[0]] if matches else None
+
+    def resolve(self, field_name, source_collection_name=None):
+        base_name = split_reference_field(field_name)
+        if base_name is None:
+            return None, None
+        key = normalize_name(base_name)
+        attempts = (
+            ("nombre", lambda: self.lookup_key(key)),
+            ("alias", lambda: self.lookup_key(normalize_name(self.aliases[key])) if key in self.aliases else None),
+            ("aproximado", lambda: self.fuzzy_lookup(key)),
+        )
+        for method, attempt in attempts:
+            target = attempt()
+            if target is not None and target != source_collection_name:
+                return target, method
+        return None, None
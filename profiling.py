@@ -0,0 +1,217 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from cardinality import CardinalityProfiler
+from containment import DEFAULT_REFERENCE_SAMPLE_SIZE, IdFilterBuilder, ReferenceSampler
+from sampling import (DEFAULT_MAX_DEPTH, DEFAULT_MAX_WIDTH, DEFAULT_SAMPLE_SIZE, CollectionSchema, SchemaSampler,
+                      collection_seed, flatten_document)
+from field_stats import DEFAULT_TOP_K, FieldStatsProfiler
+from instrumentation import NULL_METRICS
+
+logger = logging.getLogger("grafos.profiling")
+
+
+class CollectionProfile:
+    def __init__(self, name, schema, id_filter=None, reference_samples=None, field_cardinality=None, field_stats=None):
+        self.cache_key = None
+        self.name = name
+        self.schema = schema
+        self.id_filter = id_filter
+        self.reference_samples = reference_samples
+        self.field_cardinality = field_cardinality
+        self.field_stats = field_stats
+
+    @property
+    def has_values(self):
+        return self.id_filter is not None
+
+
+class CollectionProfiler:
+    # Perfilado incremental de una colección: los documentos llegan de uno en uno (iterador, cursor o flujo asíncrono).
+    def __init__(self, collection_name, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None,
+                 with_values=False, id_filter_kind="bloom", reference_sample_size=DEFAULT_REFERENCE_SAMPLE_SIZE,
+                 with_cardinality=False, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, capacity=None,
+                 with_stats=False, stats_top_k=DEFAULT_TOP_K):
+        self.collection_name = collection_name
+        self.max_depth = max_depth
+        self.max_width = max_width
+        seed = collection_seed(collection_name, seed)
+        self.schema_sampler = SchemaSampler(sample_size, strategy, seed, max_depth, max_width)
+        self.consumers = [self.schema_sampler]
+        self.id_builder = self.reference_sampler = self.cardinality_profiler = self.stats_profiler = None
+        if with_values:
+            self.id_builder = IdFilterBuilder(id_filter_kind, capacity)
+            self.reference_sampler = ReferenceSampler(reference_sample_size, seed)
+            self.consumers.extend([self.id_builder, self.reference_sampler])
+        if with_cardinality:
+            # La cardinalidad se estima sobre la muestra: solo recorre toda la colección si el muestreo (reservoir)
+            # o el modo por valores ya la recorren de todos modos.
+            full_scan = with_values or strategy != "first"
+            self.cardinality_profiler = CardinalityProfiler(None if full_scan else sample_size)
+            self.consumers.append(self.cardinality_profiler)
+        if with_stats:
+            # Las estadísticas cubren los mismos documentos que el esquema: con "first" se paran en sample_size.
+            self.stats_profiler = FieldStatsProfiler(sample_size if strategy == "first" else None, top_k=stats_top_k)
+            self.consumers.append(self.stats_profiler)
+
+    @property
+    def done(self):
+        return all(consumer.done for consumer in self.consumers)
+
+    def add(self, document):
+        # El documento se aplana una sola vez y todos los consumidores comparten las rutas.
+        fields = flatten_document(document, self.max_depth, self.max_width)
+        for consumer in self.consumers:
+            consumer.add(document, fields)
+
+    def merge(self, other):
+        # `other` perfiló los documentos que siguen a los de self, con las mismas opciones.
+        for consumer, other_consumer in zip(self.consumers, other.consumers):
+            consumer.merge(other_consumer)
+        return self
+
+    def result(self, complete=False):
+        # complete: el origen se agotó, así que los consumidores vieron la colección entera.
+        return CollectionProfile(
+            self.collection_name,
+            self.schema_sampler.schema(),
+            self.id_builder.result() if self.id_builder else None,
+            self.reference_sampler.result() if self.reference_sampler else None,
+            self.cardinality_profiler.result(complete) if self.cardinality_profiler else None,
+            self.stats_profiler.result() if self.stats_profiler else None,
+        )
+
+
+def profile_collection(collection_name, documents, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None, with_values=False, **options):
+    if isinstance(documents, CollectionSchema):
+        return CollectionProfile(collection_name, documents)
+    if hasattr(documents, "profile"):
+        # Orígenes que muestrean por su cuenta (colecciones vivas): el muestreo y la proyección se hacen en el servidor.
+        return documents.profile(collection_name, sample_size, strategy, seed, with_values, **options)
+    capacity = len(documents) if with_values and hasattr(documents, "__len__") else None
+    profiler = CollectionProfiler(collection_name, sample_size, strategy, seed, with_values, capacity=capacity, **options)
+    # Un único recorrido secuencial alimenta a todos los consumidores; se corta en cuanto ninguno necesita más documentos.
+    for document in documents or ():
+        profiler.add(document)
+        if profiler.done:
+            return profiler.result()
+    return profiler.result(complete=True)
+
+
+def profile_chunk(collection_name, documents, index, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None, capacity=None, with_values=False, **options):
+    # Un trozo de una colección en memoria, en otro proceso: devuelve el perfilador (no el perfil) para fusionarlo.
+    # Cada trozo lleva su propia semilla; el primero, la de la colección entera.
+    if index:
+        seed = ((seed or 0) ^ (index * 0x9E3779B1)) & 0xFFFFFFFF
+    profiler = CollectionProfiler(collection_name, sample_size, strategy, seed, with_values, capacity=capacity, **options)
+    for document in documents:
+        profiler.add(document)
+    return profiler
+
+
+def _merge_chunks(complete, parts):
+    profiler = parts[0].result()
+    for part in parts[1:]:
+        profiler.merge(part.result())
+    return profiler.result(complete)
+
+
+EXECUTORS = ("auto", "serial", "thread", "process")
+DEFAULT_CHUNK_SIZE = 25_000
+
+
+def is_in_memory(documents):
+    return documents is None or isinstance(documents, (list, tuple, CollectionSchema))
+
+
+def is_bounded(strategy, with_values):
+    # Con "first" y sin modo por valores, todos los consumidores se detienen en sample_size documentos.
+    return strategy == "first" and not with_values
+
+
+def collect_profiles(db_data, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None, executor="auto", max_workers=None, cache=None, metrics=NULL_METRICS, **options):
+    profiles = _collect_cached_profiles(db_data, sample_size, strategy, seed, executor, max_workers, cache, **options)
+    # Los contadores se registran al fusionar, en el proceso principal: los perfiles calculados en otros procesos también cuentan.
+    for collection_name, profile in profiles.items():
+        metrics.count("documentos_muestreados", profile.schema.sampled, collection=collection_name)
+        metrics.count("documentos_vistos", profile.schema.seen, collection=collection_name)
+        metrics.count("campos", len(profile.schema.field_types), collection=collection_name)
+    if cache is not None:
+        metrics.count("cache_aciertos", cache.hits)
+        metrics.count("cache_fallos", cache.misses)
+    return profiles
+
+
+def _collect_cached_profiles(db_data, sample_size, strategy, seed, executor, max_workers, cache, **options):
+    if cache is None:
+        return _collect_profiles(db_data, sample_size, strategy, seed, executor, max_workers, **options)
+    cache_options = {"sample_size": sample_size, "strategy": strategy, "seed": seed, **options}
+    keys = {name: cache.collection_key(name, documents, cache_options) for name, documents in db_data.items()}
+    profiles = {}
+    for collection_name, key in keys.items():
+        profile = cache.get(key)
+        if profile is not None:
+            profiles[collection_name] = profile
+    stale = {name: documents for name, documents in db_data.items() if name not in profiles}
+    logger.info("Caché de esquemas: %d colecciones sin cambios, %d a analizar.", len(profiles), len(stale))
+    for collection_name, profile in _collect_profiles(stale, sample_size, strategy, seed, executor, max_workers, **options).items():
+        key = keys[collection_name]
+        profile.cache_key = key
+        cache.put(key, profile)
+        profiles[collection_name] = profile
+    return {collection_name: profiles[collection_name] for collection_name in db_data}
+
+
+def _collect_profiles(db_data, sample_size, strategy, seed, executor, max_workers, **options):
+    if executor not in EXECUTORS:
+        raise ValueError(f"Ejecutor desconocido: '{executor}' (opciones: {EXECUTORS})")
+    if executor == "auto":
+        # Las colecciones vivas pasan casi todo el tiempo esperando al servidor: se consultan a la vez (en hilos, por el
+        # pool de conexiones del cliente). Los datos en memoria y los volcados se recorren en serie.
+        executor = "thread" if any(hasattr(documents, "profile") for documents in db_data.values()) else "serial"
+    if executor == "serial":
+        return {
+            collection_name: profile_collection(collection_name, documents, sample_size, strategy, seed, **options)
+            for collection_name, documents in db_data.items()
+        }
+    # Con "process", las colecciones en memoria (inferencia limitada por CPU) van a procesos; cursores, generadores
+    # y ficheros (limitados por E/S y no serializables) siguen en hilos. A un proceso no se le envía la lista entera:
+    # si el recorrido se corta en sample_size basta con esos documentos y, si no, se reparte en trozos que se fusionan.
+    process_names = [name for name, documents in db_data.items() if executor == "process" and is_in_memory(documents)]
+    in_processes = frozenset(process_names)
+    thread_names = [name for name in db_data if name not in in_processes]
+    bounded = is_bounded(strategy, options.get("with_values", False))
+    futures = {}
+    chunks = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as threads:
+        processes = None
+        if process_names:
+            from concurrent.futures import ProcessPoolExecutor
+            processes = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            for collection_name in process_names:
+                documents = db_data[collection_name]
+                if isinstance(documents, (list, tuple)) and bounded:
+                    documents = documents[:sample_size]
+                if not isinstance(documents, (list, tuple)) or len(documents) <= DEFAULT_CHUNK_SIZE:
+                    futures[collection_name] = processes.submit(profile_collection, collection_name, documents, sample_size, strategy, seed, **options)
+                    continue
+                capacity = len(documents) if options.get("with_values") else None
+                complete = not bounded or len(db_data[collection_name]) < sample_size
+                chunks[collection_name] = complete, [
+                    processes.submit(profile_chunk, collection_name, documents[start:start + DEFAULT_CHUNK_SIZE], index, sample_size, strategy, seed, capacity, **options)
+                    for index, start in enumerate(range(0, len(documents), DEFAULT_CHUNK_SIZE))
+                ]
+            for collection_name in thread_names:
+                futures[collection_name] = threads.submit(
+                    profile_collection, collection_name, db_data[collection_name], sample_size, strategy, seed, **options
+                )
+            # La fusión recorre db_data en su orden original. Salvo las muestras reservoir de las colecciones troceadas
+            # (uniformes, pero con otro sorteo), el resultado es el de una ejecución en serie.
+            return {
+                collection_name: _merge_chunks(*chunks[collection_name]) if collection_name in chunks else futures[collection_name].result()
+                for collection_name in db_data
+            }
+        finally:
+            if processes is not None:
+                processes.shutdown()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_OUTPUT_PREFIX = "Graph"
+DIGEST_LENGTH = 16
+RENDER_FORMATS = ("png", "svg", "pdf", "dot")
+RENDER_BACKENDS = ("auto", "pygraphviz", "subprocess")
+
+
+def graph_digest(graph):
+    # El texto DOT es la entrada exacta del render y ya es determinista: mismo esquema -> mismo hash.
+    return hashlib.sha256(graph.to_string().encode("utf-8")).hexdigest()
+
+
+def content_addressed_basename(graph, output_dir=".", prefix=DEFAULT_OUTPUT_PREFIX):
+    return os.path.join(output_dir, f"{prefix} {graph_digest(graph)[:DIGEST_LENGTH]}")
+
+
+def content_addressed_filename(graph, output_dir=".", extension="png", prefix=DEFAULT_OUTPUT_PREFIX):
+    return f"{content_addressed_basename(graph, output_dir, prefix)}.{extension}"
+
+
+def write_dot_source(dot_source, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(dot_source)
+
+
+class SubprocessBackend:
+    name = "subprocess"
+    # Cada render es un proceso dot independiente: varios pueden ejecutarse a la vez.
+    parallel = True
+
+    def __init__(self, prog="dot", timeout=None):
+        self.prog = prog
+        self.timeout = timeout
+
+    def render(self, dot_source, outputs):
+        layout_outputs = {fmt: path for fmt, path in outputs.items() if fmt != "dot"}
+        if "dot" in outputs:
+            write_dot_source(dot_source, outputs["dot"])
+        if not layout_outputs:
+            return
+        executable = shutil.which(self.prog)
+        if executable is None:
+            raise FileNotFoundError(f'"{self.prog}" no se encuentra en el PATH.')
+        # Un único proceso y un único cálculo de disposición para todos los formatos: dot admite varios pares -T/-o.
+        args = [executable]
+        for fmt, path in layout_outputs.items():
+            args.extend([f"-T{fmt}", f"-o{path}"])
+        process = subprocess.run(args, input=dot_source.encode("utf-8"), capture_output=True, timeout=self.timeout)
+        if process.returncode != 0:
+            raise RuntimeError(f"{self.prog} terminó con código {process.returncode}: {process.stderr.decode('utf-8', 'replace').strip()}")
+
+
+class PygraphvizBackend:
+    name = "pygraphviz"
+    parallel = False
+
+    def __init__(self, prog="dot"):
+        import pygraphviz
+        self.pygraphviz = pygraphviz
+        self.prog = prog
+        # libgvc no es reentrante: los renders en proceso se serializan.
+        self.lock = threading.Lock()
+
+    def render(self, dot_source, outputs):
+        with self.lock:
+            agraph = self.pygraphviz.AGraph(string=dot_source)
+            # Disposición calculada una vez dentro del proceso (libgvc); cada formato solo se dibuja sobre ella.
+            agraph.layout(prog=self.prog)
+            for fmt, path in outputs.items():
+                if fmt == "dot":
+                    write_dot_source(dot_source, path)
+                else:
+                    agraph.draw(path, format=fmt)
+
+
+def get_backend(name="auto", prog="dot"):
+    if name not in RENDER_BACKENDS:
+        raise ValueError(f"Backend de render desconocido: '{name}' (opciones: {RENDER_BACKENDS})")
+    if name in ("auto", "pygraphviz"):
+        try:
+            return PygraphvizBackend(prog)
+        except ImportError:
+            if name == "pygraphviz":
+                raise
+    return SubprocessBackend(prog)
+
+
+def render_dot(dot_source, outputs, backend=None):
+    backend = backend or get_backend()
+    # Cada formato se escribe en un temporal y se renombra al final: nunca queda un fichero a medias con el nombre definitivo.
+    temporary_outputs = {fmt: path + ".tmp" for fmt, path in outputs.items()}
+    try:
+        backend.render(dot_source, temporary_outputs)
+        for fmt, path in outputs.items():
+            os.replace(temporary_outputs[fmt], path)
+    finally:
+        for path in temporary_outputs.values():
+            if os.path.exists(path):
+                os.remove(path)
+    return outputs
+
+
+def output_paths(base_path, formats):
+    for fmt in formats:
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"Formato de salida desconocido: '{fmt}' (opciones: {RENDER_FORMATS})")
+    return {fmt: f"{base_path}.{fmt}" for fmt in formats}
+
+
+def parallel_backend(backend):
+    # Un backend en proceso renderiza de uno en uno (cerrojo); para un lote se usan procesos dot si hay ejecutable.
+    if getattr(backend, "parallel", True) or shutil.which(backend.prog) is None:
+        return backend
+    return SubprocessBackend(backend.prog)
+
+
+def render_many(jobs, backend=None, max_workers=None):
+    backend = backend or get_backend()
+    if len(jobs) > 1:
+        backend = parallel_backend(backend)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(render_dot, dot_source, outputs, backend) for dot_source, outputs in jobs]
+        return [future.result() for future in futures]
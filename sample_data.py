@@ -0,0 +1,68 @@
+def build_sample_database():
+    from bson.objectid import ObjectId
+    # Base de ejemplo del script original: blog, tienda y etiquetado N:M. Se construye solo cuando se pide.
+    user1_id = ObjectId()
+    user2_id = ObjectId()
+    user3_id = ObjectId()
+    post1_id = ObjectId()
+    post2_id = ObjectId()
+    post3_id = ObjectId()
+    comment1_id = ObjectId()
+    comment2_id = ObjectId()
+    comment3_id = ObjectId()
+    category1_id = ObjectId()
+    category2_id = ObjectId()
+    tag1_id = ObjectId()
+    tag2_id = ObjectId()
+    tag3_id = ObjectId()
+    product1_id = ObjectId()
+    product2_id = ObjectId()
+    review1_id = ObjectId()
+    review2_id = ObjectId()
+    review3_id = ObjectId()
+    tagging1_id = ObjectId()
+    tagging2_id = ObjectId()
+    tagging3_id = ObjectId()
+    tagging4_id = ObjectId()
+
+    return {
+        "users": [
+            {"_id": user1_id, "name": "Alice", "city": "Metropolis"},
+            {"_id": user2_id, "name": "Bob", "city": "Gotham"},
+            {"_id": user3_id, "name": "Charlie", "city": "Star City"}
+        ],
+        "categories": [
+            {"_id": category1_id, "name": "Tutorials", "type": "blog"},
+            {"_id": category2_id, "name": "Electronics", "type": "store"}
+        ],
+        "posts": [
+            {"_id": post1_id, "title": "Advanced Python", "content": "...", "user_id": user1_id, "category_id": category1_id},
+            {"_id": post2_id, "title": "Intro to MongoDB", "content": "...", "user_id": user2_id, "category_id": category1_id},
+            {"_id": post3_id, "title": "Data Viz", "content": "...", "user_id": user1_id, "category_id": category1_id}
+        ],
+        "comments": [
+            {"_id": comment1_id, "text": "Very helpful!", "post_id": post1_id, "user_id": user2_id},
+            {"_id": comment2_id, "text": "Good explanation.", "post_id": post2_id, "user_id": user1_id},
+            {"_id": comment3_id, "text": "I have a question...", "post_id": post1_id, "user_id": user3_id}
+        ],
+        "products": [
+            {"_id": product1_id, "name": "Laptop Pro", "price": 1200.00, "seller_id": user1_id, "category_id": category2_id},
+            {"_id": product2_id, "name": "Wireless Mouse", "price": 25.50, "seller_id": user2_id, "category_id": category2_id}
+        ],
+        "reviews": [
+            {"_id": review1_id, "text": "Excellent product!", "rating": 5, "product_id": product1_id, "user_id": user2_id},
+            {"_id": review2_id, "text": "Works great.", "rating": 4, "product_id": product2_id, "user_id": user3_id},
+            {"_id": review3_id, "text": "Good value for money.", "rating": 4, "product_id": product1_id, "user_id": user3_id}
+        ],
+        "tags": [
+            {"_id": tag1_id, "name": "python"},
+            {"_id": tag2_id, "name": "database"},
+            {"_id": tag3_id, "name": "webdev"}
+        ],
+        "taggings": [
+            {"_id": tagging1_id, "post_id": post1_id, "tag_id": tag1_id},
+            {"_id": tagging2_id, "post_id": post2_id, "tag_id": tag2_id},
+            {"_id": tagging3_id, "post_id": post1_id, "tag_id": tag3_id},
+            {"_id": tagging4_id, "post_id": post3_id, "tag_id": tag1_id}
+        ]
+    }
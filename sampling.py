@@ -0,0 +1,208 @@
+import random
+import zlib
+from collections import Counter
+from itertools import islice
+
+DEFAULT_SAMPLE_SIZE = 1000
+DEFAULT_MAX_DEPTH = 5
+DEFAULT_MAX_WIDTH = 100
+SAMPLING_STRATEGIES = ("first", "reservoir")
+
+
+def type_name(value):
+    if type(value).__name__ == "ObjectId":
+        return "ObjectId"
+    if isinstance(value, list):
+        return "list"
+    return type(value).__name__
+
+
+def _array_items(values, max_width):
+    return (("[]", value) for value in islice(values, max_width))
+
+
+def flatten_document(document, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH):
+    # Recorrido en orden con una pila explícita de iteradores: la profundidad del documento no consume la pila de Python.
+    # Los subdocumentos producen rutas "a.b" y los elementos de un array "a[]", "a[].b"; max_width acota claves y elementos.
+    fields = []
+    stack = [(islice(document.items(), max_width), "", 1)]
+    while stack:
+        items, prefix, depth = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        key, value = item
+        path = f"{prefix}{key}" if key == "[]" or not prefix else f"{prefix}.{key}"
+        fields.append((path, value))
+        if depth >= max_depth:
+            continue
+        if isinstance(value, dict):
+            stack.append((islice(value.items(), max_width), path, depth + 1))
+        elif isinstance(value, list):
+            stack.append((_array_items(value, max_width), path, depth + 1))
+    return fields
+
+
+def document_signature(document, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH, fields=None):
+    # Solo se guardan pares (ruta, tipo), una vez por documento: el muestreo nunca retiene los documentos completos.
+    if fields is None:
+        fields = flatten_document(document, max_depth, max_width)
+    return tuple(dict.fromkeys((path, type_name(value)) for path, value in fields))
+
+
+class FirstNSampler:
+    def __init__(self, size):
+        self.size = size
+        self.seen = 0
+        self.items = []
+
+    @property
+    def full(self):
+        return len(self.items) >= self.size
+
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+
+    def merge(self, other):
+        # `other` muestreó los documentos que siguen a los de self: los primeros de la unión son los de self y luego los suyos.
+        self.items.extend(other.items[:self.size - len(self.items)])
+        self.seen += other.seen
+        return self
+
+
+def merge_reservoirs(rng, size, items, seen, other_items, other_seen):
+    # Muestra uniforme de la unión de dos poblaciones a partir de una muestra uniforme de cada una: cada hueco sale
+    # de una parte con probabilidad proporcional a los elementos que aún no se han sacado de ella.
+    items, other_items = list(items), list(other_items)
+    rng.shuffle(items)
+    rng.shuffle(other_items)
+    merged = []
+    while len(merged) < size and (items or other_items):
+        if rng.randrange(seen + other_seen) < seen:
+            merged.append(items.pop())
+            seen -= 1
+        else:
+            merged.append(other_items.pop())
+            other_seen -= 1
+    return merged
+
+
+class ReservoirSampler:
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.seen = 0
+        self.items = []
+        self.rng = random.Random(seed)
+
+    @property
+    def full(self):
+        return False
+
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        slot = self.rng.randrange(self.seen)
+        if slot < self.size:
+            self.items[slot] = item
+
+    def merge(self, other):
+        self.items = merge_reservoirs(self.rng, self.size, self.items, self.seen, other.items, other.seen)
+        self.seen += other.seen
+        return self
+
+
+def make_sampler(size, strategy="first", seed=None):
+    if strategy == "first":
+        return FirstNSampler(size)
+    if strategy == "reservoir":
+        return ReservoirSampler(size, seed)
+    raise ValueError(f"Estrategia de muestreo desconocida: '{strategy}' (opciones: {SAMPLING_STRATEGIES})")
+
+
+class CollectionSchema:
+    def __init__(self):
+        self.sampled = 0
+        self.seen = 0
+        self.field_types = {}
+
+    def __bool__(self):
+        return self.sampled > 0
+
+    def add_signature(self, signature):
+        self.sampled += 1
+        for field, name in signature:
+            self.add_field_type(field, name)
+
+    def add_field_type(self, field, name, count=1):
+        counter = self.field_types.get(field)
+        if counter is None:
+            counter = self.field_types[field] = Counter()
+        counter[name] += count
+
+    def merge(self, other):
+        self.sampled += other.sampled
+        self.seen += other.seen
+        for field, counter in other.field_types.items():
+            for name, count in counter.items():
+                self.add_field_type(field, name, count)
+        return self
+
+    def types(self, field):
+        return self.field_types.get(field, Counter())
+
+    def has_type(self, field, name):
+        return self.types(field)[name] > 0
+
+    def dominant_type(self, field):
+        counter = self.types(field)
+        if not counter:
+            return None
+        return counter.most_common(1)[0][0]
+
+    def format_types(self, field):
+        counter = self.types(field)
+        if len(counter) == 1:
+            return next(iter(counter))
+        total = sum(counter.values())
+        return " / ".join(f"{name} {round(100 * count / total)}%" for name, count in counter.most_common())
+
+    def format_field(self, field):
+        return f"{field}: {self.format_types(field)}"
+
+
+class SchemaSampler:
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE, strategy="first", seed=None, max_depth=DEFAULT_MAX_DEPTH, max_width=DEFAULT_MAX_WIDTH):
+        self.sampler = make_sampler(sample_size, strategy, seed)
+        self.max_depth = max_depth
+        self.max_width = max_width
+
+    @property
+    def done(self):
+        return self.sampler.full
+
+    def add(self, document, fields=None):
+        if self.sampler.full:
+            self.sampler.seen += 1
+            return
+        self.sampler.add(document_signature(document, self.max_depth, self.max_width, fields))
+
+    def merge(self, other):
+        self.sampler.merge(other.sampler)
+        return self
+
+    def schema(self):
+        schema = CollectionSchema()
+        for signature in self.sampler.items:
+            schema.add_signature(signature)
+        schema.seen = self.sampler.seen
+        return schema
+
+
+def collection_seed(collection_name, seed=None):
+    base = zlib.crc32(collection_name.encode("utf-8"))
+    return base if seed is None else base ^ seed
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from sampling import CollectionSchema
+
+DEFAULT_CACHE_DIR = ".grafos_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_VERSION = 3
+
+
+def content_digest(documents):
+    # Marca exacta para colecciones en memoria: hash del contenido de todos los documentos. Cuesta un recorrido
+    # de la lista, pero cualquier cambio (un campo nuevo en un documento intermedio, un valor editado) invalida la entrada.
+    digest = hashlib.blake2b(digest_size=16)
+    for document in documents:
+        digest.update(repr(document).encode("utf-8", "replace"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def source_marker(documents):
+    # Los orígenes que sepan algo mejor (fecha de modificación de un volcado, hash del servidor) exponen schema_marker().
+    marker = getattr(documents, "schema_marker", None)
+    if callable(marker):
+        return marker()
+    if documents is None:
+        return [0]
+    if isinstance(documents, (list, tuple)):
+        return [len(documents), content_digest(documents)]
+    return None
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode("utf-8")).hexdigest()
+
+
+class SchemaCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, namespace="default"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def collection_key(self, collection_name, documents, options):
+        if isinstance(documents, CollectionSchema):
+            return None
+        marker = source_marker(documents)
+        if marker is None:
+            return None
+        return _digest([CACHE_VERSION, "collection", self.namespace, collection_name, marker, options])
+
+    def relationships_key(self, profile_keys, options):
+        if not profile_keys or any(key is None for key in profile_keys):
+            return None
+        return _digest([CACHE_VERSION, "relationships", self.namespace, sorted(profile_keys), options])
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key):
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        # La fecha de modificación hace de "último uso" para el desalojo LRU.
+        os.utime(path)
+        self.hits += 1
+        return entry["value"]
+
+    def put(self, key, value, **metadata):
+        if key is None:
+            return
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"value": value, **metadata}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
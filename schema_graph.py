@@ -0,0 +1,300 @@
+import logging
+from array import array
+
+from cardinality import join_label
+from instrumentation import NULL_METRICS
+
+logger = logging.getLogger("grafos.schema_graph")
+
+NODE_COLORS = ("lightblue", "lightgreen", "lightyellow", "lightcoral", "lightcyan", "lightsalmon", "lightpink", "lightgrey")
+CARDINALITIES = ("1:1", "1:N", "N:1", "N:M")
+NO_CONFIDENCE = -1.0
+# Marcas por arista (edge_flags); las pone, p. ej., index_advisor.
+UNINDEXED = 1
+
+
+class Interner:
+    # Nombre <-> entero denso: cada cadena se guarda una sola vez y el resto del modelo solo maneja índices.
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def get(self, name):
+        return self.ids.get(name)
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+
+class SchemaGraph:
+    # Modelo del diagrama en arrays planos: colecciones, campos y etiquetas de tipo internados como enteros,
+    # atributos por colección y aristas en listas de adyacencia comprimidas (CSR). pydot es solo un destino de exportación.
+    __slots__ = (
+        "collections", "fields", "type_labels", "notes", "documents", "hidden", "field_offsets", "field_ids", "field_types", "field_notes",
+        "edge_sources", "edge_targets", "edge_fields", "edge_cardinalities", "edge_confidences", "edge_flags",
+        "edge_joins", "edge_join_fields",
+        "_out_offsets", "_out_edges", "_in_offsets", "_in_edges",
+    )
+
+    def __init__(self):
+        self.collections = Interner()
+        self.fields = Interner()
+        self.type_labels = Interner()
+        # Nota 0 = sin nota; el resto son resúmenes de estadísticas por campo, solo para las etiquetas.
+        self.notes = Interner([""])
+        self.documents = array("Q")
+        self.hidden = bytearray()
+        self.field_offsets = array("I", [0])
+        self.field_ids = array("I")
+        self.field_types = array("I")
+        self.field_notes = array("I")
+        self.edge_sources = array("I")
+        self.edge_targets = array("I")
+        self.edge_fields = array("I")
+        self.edge_cardinalities = array("B")
+        self.edge_confidences = array("d")
+        self.edge_flags = bytearray()
+        # Aristas N:M: colección intermedia (-1 si no hay) y sus dos campos, el que apunta al origen y el que apunta al destino.
+        self.edge_joins = array("i")
+        self.edge_join_fields = array("I")
+        self._out_offsets = None
+
+    @classmethod
+    def from_analysis(cls, profiles, relationships, join_collections=(), field_stats=False):
+        graph = cls()
+        # join_collections puede ser solo los nombres o el dict de collapse_join_collections, que además da sus campos.
+        join_edges = {}
+        if hasattr(join_collections, "items"):
+            for join_name, ((first, first_field), (second, second_field)) in join_collections.items():
+                join_edges[first, second, join_label(join_name, first_field, second_field)] = (join_name, first_field, second_field)
+        join_collections = frozenset(join_collections)
+        for collection_name, profile in profiles.items():
+            schema = profile.schema
+            stats = profile.field_stats if field_stats else None
+            graph.add_collection(
+                collection_name,
+                [(field, schema.format_types(field), stats.summary(field) if stats else "") for field in schema.field_types],
+                documents=schema.seen,
+                hidden=collection_name in join_collections,
+            )
+        for target, source, cardinality, field, confidence in relationships:
+            target_id = graph.collections.get(target)
+            source_id = graph.collections.get(source)
+            if target_id is None or source_id is None or graph.hidden[target_id] or graph.hidden[source_id]:
+                logger.warning("⚠️ Advertencia: Nodo '%s' o '%s' no encontrado en el grafo. No se pudo añadir la arista para (%s, %s, %s).", target, source, target, source, field)
+                continue
+            join = join_edges.get((target, source, field)) if cardinality == "N:M" else None
+            if join is not None:
+                join = (graph.collections.get(join[0]), join[1], join[2])
+                if join[0] is None:
+                    join = None
+            graph.add_edge(target_id, source_id, field, cardinality, confidence, join=join)
+        return graph
+
+    def add_collection(self, name, attributes=(), documents=0, hidden=False):
+        if name in self.collections:
+            raise ValueError(f"Colección duplicada en el grafo: '{name}'")
+        collection_id = self.collections.intern(name)
+        self.documents.append(documents)
+        self.hidden.append(1 if hidden else 0)
+        for field, type_label, *note in attributes:
+            self.field_ids.append(self.fields.intern(field))
+            self.field_types.append(self.type_labels.intern(type_label))
+            self.field_notes.append(self.notes.intern(note[0]) if note else 0)
+        self.field_offsets.append(len(self.field_ids))
+        self._out_offsets = None
+        return collection_id
+
+    def add_edge(self, source_id, target_id, field, cardinality="1:N", confidence=None, flags=0, join=None):
+        # join = (id de la colección intermedia, campo hacia el origen, campo hacia el destino) en las aristas N:M.
+        self.edge_sources.append(source_id)
+        self.edge_targets.append(target_id)
+        self.edge_fields.append(self.fields.intern(field))
+        self.edge_cardinalities.append(CARDINALITIES.index(cardinality))
+        self.edge_confidences.append(NO_CONFIDENCE if confidence is None else confidence)
+        self.edge_flags.append(flags)
+        if join is None:
+            self.edge_joins.append(-1)
+            self.edge_join_fields.extend((0, 0))
+        else:
+            join_id, source_field, target_field = join
+            self.edge_joins.append(join_id)
+            self.edge_join_fields.extend((self.fields.intern(source_field), self.fields.intern(target_field)))
+        self._out_offsets = None
+
+    @property
+    def collection_count(self):
+        return len(self.collections)
+
+    @property
+    def edge_count(self):
+        return len(self.edge_sources)
+
+    @property
+    def join_collections(self):
+        return tuple(name for index, name in enumerate(self.collections) if self.hidden[index])
+
+    def visible(self):
+        return [index for index in range(len(self.collections)) if not self.hidden[index]]
+
+    def attributes(self, collection_id, with_notes=False):
+        start, end = self.field_offsets[collection_id], self.field_offsets[collection_id + 1]
+        if with_notes:
+            return [(self.fields[self.field_ids[i]], self.type_labels[self.field_types[i]], self.notes[self.field_notes[i]]) for i in range(start, end)]
+        return [(self.fields[self.field_ids[i]], self.type_labels[self.field_types[i]]) for i in range(start, end)]
+
+    def edge(self, edge_id):
+        confidence = self.edge_confidences[edge_id]
+        return (
+            self.collections[self.edge_sources[edge_id]],
+            self.collections[self.edge_targets[edge_id]],
+            CARDINALITIES[self.edge_cardinalities[edge_id]],
+            self.fields[self.edge_fields[edge_id]],
+            None if confidence == NO_CONFIDENCE else confidence,
+        )
+
+    def edge_join(self, edge_id):
+        # (colección intermedia, campo que referencia al origen, campo que referencia al destino), o None.
+        join_id = self.edge_joins[edge_id]
+        if join_id < 0:
+            return None
+        return self.collections[join_id], self.fields[self.edge_join_fields[2 * edge_id]], self.fields[self.edge_join_fields[2 * edge_id + 1]]
+
+    @property
+    def relationships(self):
+        return [self.edge(edge_id) for edge_id in range(self.edge_count)]
+
+    def _build_adjacency(self):
+        # CSR por ordenación por cuentas: offsets[n] .. offsets[n + 1] delimita las aristas de cada nodo, en orden de inserción.
+        def csr(keys):
+            offsets = array("I", bytes(4 * (len(self.collections) + 1)))
+            for key in keys:
+                offsets[key + 1] += 1
+            for index in range(len(self.collections)):
+                offsets[index + 1] += offsets[index]
+            cursor = array("I", offsets)
+            edges = array("I", bytes(4 * len(keys)))
+            for edge_id, key in enumerate(keys):
+                edges[cursor[key]] = edge_id
+                cursor[key] += 1
+            return offsets, edges
+        self._out_offsets, self._out_edges = csr(self.edge_sources)
+        self._in_offsets, self._in_edges = csr(self.edge_targets)
+
+    def out_edges(self, collection_id):
+        if self._out_offsets is None:
+            self._build_adjacency()
+        return self._out_edges[self._out_offsets[collection_id]:self._out_offsets[collection_id + 1]]
+
+    def in_edges(self, collection_id):
+        if self._out_offsets is None:
+            self._build_adjacency()
+        return self._in_edges[self._in_offsets[collection_id]:self._in_offsets[collection_id + 1]]
+
+    def successors(self, collection_id):
+        return [self.edge_targets[edge_id] for edge_id in self.out_edges(collection_id)]
+
+    def predecessors(self, collection_id):
+        return [self.edge_sources[edge_id] for edge_id in self.in_edges(collection_id)]
+
+    def subgraph(self, collection_ids):
+        # Copia con solo estas colecciones y las aristas entre ellas; los identificadores se vuelven a numerar.
+        # La intermedia de cada arista N:M que se conserva viaja con ella (oculta) aunque no esté en collection_ids.
+        graph = SchemaGraph()
+        mapping = {}
+
+        def copy(collection_id):
+            mapping[collection_id] = graph.add_collection(
+                self.collections[collection_id], self.attributes(collection_id, with_notes=True), self.documents[collection_id], self.hidden[collection_id]
+            )
+            return mapping[collection_id]
+
+        for collection_id in sorted(set(collection_ids)):
+            copy(collection_id)
+        for edge_id in range(self.edge_count):
+            source_id, target_id = self.edge_sources[edge_id], self.edge_targets[edge_id]
+            if source_id in mapping and target_id in mapping:
+                _, _, cardinality, field, confidence = self.edge(edge_id)
+                join = self.edge_join(edge_id)
+                if join is not None:
+                    join_id = self.edge_joins[edge_id]
+                    join = (mapping[join_id] if join_id in mapping else copy(join_id), join[1], join[2])
+                graph.add_edge(mapping[source_id], mapping[target_id], field, cardinality, confidence, self.edge_flags[edge_id], join)
+        return graph
+
+    def node_label(self, collection_id):
+        name = self.collections[collection_id]
+        label = f"{name}\n{'-'*len(name)}\n"
+        start, end = self.field_offsets[collection_id], self.field_offsets[collection_id + 1]
+        if start == end:
+            return label + "(Colección Vacía)"
+        return label + "\n".join(self._attribute_label(i) for i in range(start, end))
+
+    def _attribute_label(self, index):
+        label = f"{self.fields[self.field_ids[index]]}: {self.type_labels[self.field_types[index]]}"
+        note = self.field_notes[index]
+        return f"{label} ({self.notes[note]})" if note else label
+
+    def edge_label(self, edge_id):
+        label = f"{CARDINALITIES[self.edge_cardinalities[edge_id]]}\n({self.fields[self.edge_fields[edge_id]]})"
+        confidence = self.edge_confidences[edge_id]
+        if confidence != NO_CONFIDENCE:
+            label += f"\n{confidence:.0%}"
+        if self.edge_flags[edge_id] & UNINDEXED:
+            label += "\n⚠️ sin índice"
+        return label
+
+    def to_pydot(self, metrics=NULL_METRICS):
+        import pydot
+        graph = pydot.Dot(graph_type='digraph', rankdir='LR')
+        logger.info("--- Creando nodos para las colecciones ---")
+        for collection_id, collection_name in enumerate(self.collections):
+            # Las colecciones intermedias no se dibujan pero conservan su turno de color: el resto no cambia de color.
+            node_color = NODE_COLORS[collection_id % len(NODE_COLORS)]
+            if self.hidden[collection_id]:
+                logger.info("Colección intermedia '%s' representada como relación N:M.", collection_name)
+                continue
+            attribute_count = self.field_offsets[collection_id + 1] - self.field_offsets[collection_id]
+            if attribute_count:
+                graph.add_node(pydot.Node(collection_name, label=self.node_label(collection_id), shape='box', style="filled", fillcolor=node_color))
+                logger.debug("Nodo creado para '%s' con %d atributos.", collection_name, attribute_count)
+                metrics.count("atributos", attribute_count, collection=collection_name)
+            else:
+                graph.add_node(pydot.Node(collection_name, label=self.node_label(collection_id), shape='box', style="filled", fillcolor=node_color, fontcolor="gray"))
+                logger.debug("Nodo creado para colección vacía: '%s'.", collection_name)
+        logger.info("--- Nodos creados ---")
+        logger.info("--- Añadiendo aristas para las relaciones detectadas ---")
+        if not self.edge_count:
+            logger.info("No se detectaron relaciones automáticamente.")
+        for edge_id in range(self.edge_count):
+            source, target = self.collections[self.edge_sources[edge_id]], self.collections[self.edge_targets[edge_id]]
+            if self.edge_flags[edge_id] & UNINDEXED:
+                graph.add_edge(pydot.Edge(source, target, label=self.edge_label(edge_id), color="red", fontcolor="red", style="dashed"))
+            else:
+                graph.add_edge(pydot.Edge(source, target, label=self.edge_label(edge_id)))
+            logger.debug("Arista añadida: %s -> %s [%s]", source, target, self.fields[self.edge_fields[edge_id]])
+        logger.info("--- Aristas añadidas ---")
+        return graph
+
+    def __repr__(self):
+        return f"SchemaGraph({len(self.visible())} colecciones, {self.edge_count} relaciones)"
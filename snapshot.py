@@ -0,0 +1,244 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+
+from rendering import RENDER_BACKENDS, RENDER_FORMATS, content_addressed_basename, get_backend, output_paths, render_many
+
+logger = logging.getLogger("grafos.snapshot")
+
+SNAPSHOT_VERSION = 1
+DIFF_COLORS = {"added": "palegreen", "removed": "lightcoral", "changed": "khaki", "same": "white"}
+
+
+def label_types(type_label):
+    # "float 92% / int 8%" -> ["float", "int"]: los porcentajes cambian con cada muestreo y no son deriva del esquema.
+    return sorted(part.rsplit(" ", 1)[0] if part.endswith("%") else part for part in type_label.split(" / "))
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def to_snapshot(graph):
+    collections = {}
+    for collection_id, name in enumerate(graph.collections):
+        fields = {field: label_types(type_label) for field, type_label in graph.attributes(collection_id)}
+        collections[name] = {
+            "digest": _digest(fields),
+            "documents": graph.documents[collection_id],
+            "join": bool(graph.hidden[collection_id]),
+            "fields": fields,
+        }
+    relationships = {}
+    for source, target, cardinality, field, confidence in graph.relationships:
+        relationships[f"{source}|{target}|{field}"] = {
+            "source": source, "target": target, "field": field, "cardinality": cardinality, "confidence": confidence,
+        }
+    return {
+        "version": SNAPSHOT_VERSION,
+        "digest": _digest([{name: collection["digest"] for name, collection in collections.items()}, sorted((key, relationship["cardinality"]) for key, relationship in relationships.items())]),
+        "collections": collections,
+        "relationships": relationships,
+    }
+
+
+def save_snapshot(graph, path):
+    snapshot = to_snapshot(graph)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=1, sort_keys=True, ensure_ascii=False)
+    logger.info("📸 Instantánea del esquema guardada en %s", path)
+    return snapshot
+
+
+def load_snapshot(path):
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Versión de instantánea no soportada en {path}: {snapshot.get('version')} (se esperaba {SNAPSHOT_VERSION})")
+    return snapshot
+
+
+class SchemaDiff:
+    def __init__(self):
+        self.added_collections = []
+        self.removed_collections = []
+        self.added_fields = []
+        self.removed_fields = []
+        self.type_changes = []
+        self.added_relationships = []
+        self.removed_relationships = []
+        self.cardinality_changes = []
+
+    def __bool__(self):
+        return any(self.to_dict().values())
+
+    def to_dict(self):
+        return {
+            "added_collections": self.added_collections,
+            "removed_collections": self.removed_collections,
+            "added_fields": self.added_fields,
+            "removed_fields": self.removed_fields,
+            "type_changes": self.type_changes,
+            "added_relationships": self.added_relationships,
+            "removed_relationships": self.removed_relationships,
+            "cardinality_changes": self.cardinality_changes,
+        }
+
+    def format_text(self):
+        lines = []
+        lines += [f"+ colección {name}" for name in self.added_collections]
+        lines += [f"- colección {name}" for name in self.removed_collections]
+        lines += [f"+ {collection}.{field}: {' / '.join(types)}" for collection, field, types in self.added_fields]
+        lines += [f"- {collection}.{field}: {' / '.join(types)}" for collection, field, types in self.removed_fields]
+        lines += [f"~ {collection}.{field}: {' / '.join(old)} -> {' / '.join(new)}" for collection, field, old, new in self.type_changes]
+        lines += [f"+ relación {source} --({field})--> {target} ({cardinality})" for source, target, field, cardinality in self.added_relationships]
+        lines += [f"- relación rota {source} --({field})--> {target} ({cardinality})" for source, target, field, cardinality in self.removed_relationships]
+        lines += [f"~ cardinalidad {source} --({field})--> {target}: {old} -> {new}" for source, target, field, old, new in self.cardinality_changes]
+        return "\n".join(lines) if lines else "Sin cambios en el esquema."
+
+
+def diff_snapshots(old, new):
+    # Lineal en colecciones + campos + relaciones: todo se cruza por clave en diccionarios, y las colecciones
+    # cuyo digest no cambió se saltan sin mirar sus campos. Si coincide el digest global no hay nada que recorrer.
+    diff = SchemaDiff()
+    if old["digest"] == new["digest"]:
+        return diff
+    old_collections, new_collections = old["collections"], new["collections"]
+    for name, collection in new_collections.items():
+        previous = old_collections.get(name)
+        if previous is None:
+            diff.added_collections.append(name)
+            diff.added_fields.extend((name, field, types) for field, types in collection["fields"].items())
+            continue
+        if previous["digest"] == collection["digest"]:
+            continue
+        old_fields, new_fields = previous["fields"], collection["fields"]
+        for field, types in new_fields.items():
+            old_types = old_fields.get(field)
+            if old_types is None:
+                diff.added_fields.append((name, field, types))
+            elif old_types != types:
+                diff.type_changes.append((name, field, old_types, types))
+        diff.removed_fields.extend((name, field, types) for field, types in old_fields.items() if field not in new_fields)
+    for name, collection in old_collections.items():
+        if name not in new_collections:
+            diff.removed_collections.append(name)
+            diff.removed_fields.extend((name, field, types) for field, types in collection["fields"].items())
+    old_relationships, new_relationships = old["relationships"], new["relationships"]
+    for key, relationship in new_relationships.items():
+        previous = old_relationships.get(key)
+        if previous is None:
+            diff.added_relationships.append((relationship["source"], relationship["target"], relationship["field"], relationship["cardinality"]))
+        elif previous["cardinality"] != relationship["cardinality"]:
+            diff.cardinality_changes.append((relationship["source"], relationship["target"], relationship["field"], previous["cardinality"], relationship["cardinality"]))
+    for key, relationship in old_relationships.items():
+        if key not in new_relationships:
+            diff.removed_relationships.append((relationship["source"], relationship["target"], relationship["field"], relationship["cardinality"]))
+    return diff
+
+
+def diff_graph(old, new, diff=None):
+    # Diagrama de la unión de ambas versiones: verde lo añadido, rojo (discontinuo) lo eliminado, amarillo lo modificado.
+    import pydot
+    diff = diff if diff is not None else diff_snapshots(old, new)
+    added_fields = {(collection, field) for collection, field, _ in diff.added_fields}
+    changed_types = {(collection, field): (old_types, new_types) for collection, field, old_types, new_types in diff.type_changes}
+    removed_by_collection = {}
+    for collection, field, types in diff.removed_fields:
+        removed_by_collection.setdefault(collection, []).append((field, types))
+    changed_collections = {collection for collection, _ in added_fields} | {collection for collection, _ in changed_types} | set(removed_by_collection)
+    graph = pydot.Dot(graph_type='digraph', rankdir='LR')
+    names = list(new["collections"]) + [name for name in old["collections"] if name not in new["collections"]]
+    for name in names:
+        collection = new["collections"].get(name) or old["collections"][name]
+        if collection["join"]:
+            continue
+        if name in diff.added_collections:
+            status = "added"
+        elif name in diff.removed_collections:
+            status = "removed"
+        elif name in changed_collections:
+            status = "changed"
+        else:
+            status = "same"
+        lines = []
+        for field, types in collection["fields"].items():
+            if (name, field) in changed_types:
+                old_types, new_types = changed_types[name, field]
+                lines.append(f"~ {field}: {' / '.join(old_types)} -> {' / '.join(new_types)}")
+            elif (name, field) in added_fields and status != "added":
+                lines.append(f"+ {field}: {' / '.join(types)}")
+            else:
+                lines.append(f"{field}: {' / '.join(types)}")
+        if status != "removed":
+            lines += [f"- {field}: {' / '.join(types)}" for field, types in removed_by_collection.get(name, [])]
+        label = f"{name}\n{'-'*len(name)}\n" + "\n".join(lines)
+        attributes = {"label": label, "shape": "box", "style": "filled", "fillcolor": DIFF_COLORS[status]}
+        if status == "removed":
+            attributes["style"] = "filled,dashed"
+        graph.add_node(pydot.Node(name, **attributes))
+    added = {(source, target, field) for source, target, field, _ in diff.added_relationships}
+    changed = {(source, target, field): (old_cardinality, new_cardinality) for source, target, field, old_cardinality, new_cardinality in diff.cardinality_changes}
+    for relationship in new["relationships"].values():
+        key = (relationship["source"], relationship["target"], relationship["field"])
+        if key in added:
+            graph.add_edge(pydot.Edge(key[0], key[1], label=f"{relationship['cardinality']}\n({key[2]})", color="darkgreen", fontcolor="darkgreen", penwidth=2))
+        elif key in changed:
+            graph.add_edge(pydot.Edge(key[0], key[1], label=f"{changed[key][0]} -> {changed[key][1]}\n({key[2]})", color="darkorange", fontcolor="darkorange", penwidth=2))
+        else:
+            graph.add_edge(pydot.Edge(key[0], key[1], label=f"{relationship['cardinality']}\n({key[2]})", color="gray"))
+    for source, target, field, cardinality in diff.removed_relationships:
+        graph.add_edge(pydot.Edge(source, target, label=f"{cardinality}\n({field})", color="red", fontcolor="red", style="dashed"))
+    return graph
+
+
+def snapshot_pairs(old_path, new_path):
+    # Con dos directorios se comparan las instantáneas del mismo nombre: una sola ejecución para cientos de bases de datos.
+    if os.path.isdir(old_path) and os.path.isdir(new_path):
+        names = sorted(set(os.listdir(old_path)) | set(os.listdir(new_path)))
+        return [(name, os.path.join(old_path, name), os.path.join(new_path, name)) for name in names if name.endswith(".json")]
+    return [(os.path.basename(new_path), old_path, new_path)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m snapshot", description="Compara dos instantáneas de esquema (o dos directorios de instantáneas).")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--render", metavar="DIRECTORIO", help="Genera un diagrama de diferencias por base de datos con cambios.")
+    parser.add_argument("-f", "--format", action="append", choices=RENDER_FORMATS, help="Formatos del diagrama (por defecto png).")
+    parser.add_argument("--backend", choices=RENDER_BACKENDS, default="auto")
+    parser.add_argument("--json", help="Escribe todas las diferencias en este fichero JSON.")
+    parser.add_argument("--fail-on-change", action="store_true", help="Termina con código 1 si hay cambios.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    jobs = []
+    for name, old_path, new_path in snapshot_pairs(args.old, args.new):
+        empty = {"version": SNAPSHOT_VERSION, "digest": None, "collections": {}, "relationships": {}}
+        old = load_snapshot(old_path) if os.path.exists(old_path) else empty
+        new = load_snapshot(new_path) if os.path.exists(new_path) else empty
+        diff = diff_snapshots(old, new)
+        results[name] = diff
+        if not diff:
+            continue
+        print(f"=== {name} ===\n{diff.format_text()}")
+        if args.render:
+            graph = diff_graph(old, new, diff)
+            jobs.append((graph.to_string(), output_paths(content_addressed_basename(graph, args.render, f"Diff {os.path.splitext(name)[0]}"), args.format or ["png"])))
+    changed = sum(1 for diff in results.values() if diff)
+    print(f"{changed} de {len(results)} esquemas con cambios.")
+    if jobs:
+        os.makedirs(args.render, exist_ok=True)
+        for outputs in render_many(jobs, get_backend(args.backend)):
+            print(f"Diagrama de diferencias: {', '.join(outputs.values())}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({name: diff.to_dict() for name, diff in results.items()}, f, indent=2, ensure_ascii=False)
+    return 1 if changed and args.fail_on_change else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import random
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+BASE_TYPES = ("str", "int", "float", "bool", "datetime")
+EPOCH = datetime(2020, 1, 1)
+
+
+def collection_name(index):
+    return f"entity{index:04d}s"
+
+
+def random_value(rng, type_name):
+    if type_name == "str":
+        return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 16)))
+    if type_name == "int":
+        return rng.randint(0, 1_000_000)
+    if type_name == "float":
+        return rng.random() * 1000
+    if type_name == "bool":
+        return rng.random() < 0.5
+    return EPOCH + timedelta(seconds=rng.randint(0, 10**8))
+
+
+def random_object_id(rng):
+    return ObjectId(rng.getrandbits(96).to_bytes(12, "big"))
+
+
+def generate_database(collections=20, documents=1000, fields=8, fk_density=1.5, nesting_depth=0, type_variance=0.1, seed=0):
+    rng = random.Random(seed)
+    names = [collection_name(i) for i in range(collections)]
+    ids = {name: [random_object_id(rng) for _ in range(documents)] for name in names}
+    db_data = {}
+    for name in names:
+        field_types = {f"field{k}": rng.choice(BASE_TYPES) for k in range(fields)}
+        # fk_density es el número esperado de claves foráneas por colección (sin autorreferencias).
+        reference_probability = min(1.0, fk_density / max(1, collections - 1))
+        references = [target for target in names if target != name and rng.random() < reference_probability]
+        documents_data = []
+        for doc_index in range(documents):
+            document = {"_id": ids[name][doc_index]}
+            for field, base_type in field_types.items():
+                value_type = rng.choice(BASE_TYPES) if rng.random() < type_variance else base_type
+                document[field] = random_value(rng, value_type)
+            for target in references:
+                document[f"{target[:-1]}_id"] = rng.choice(ids[target])
+            container = document
+            for depth in range(nesting_depth):
+                nested = {f"nested{depth}_field": random_value(rng, rng.choice(BASE_TYPES))}
+                if references:
+                    target = references[depth % len(references)]
+                    nested["items"] = [{f"{target[:-1]}_id": rng.choice(ids[target]), "quantity": rng.randint(1, 9)}
+                                       for _ in range(rng.randint(0, 3))]
+                container[f"nested{depth}"] = nested
+                container = nested
+            documents_data.append(document)
+        db_data[name] = documents_data
+    return db_data
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+import Grafos
+from Grafos import analyze, build_parser, parse_aliases
+from naming import DEFAULT_ALIASES
+from schema_cache import SchemaCache
+
+
+@pytest.fixture
+def database():
+    accounts = [{"_id": ObjectId(), "name": f"cuenta {i}"} for i in range(5)]
+    posts = [{"_id": ObjectId(), "writer_id": accounts[i % 5]["_id"]} for i in range(10)]
+    return {"accounts": accounts, "posts": posts}
+
+
+def edges(schema_graph):
+    return {(relationship[0], relationship[1], relationship[3]) for relationship in schema_graph.relationships}
+
+
+def test_analyze_resolves_fields_through_aliases(database):
+    assert edges(analyze(database)) == set()
+    assert edges(analyze(database, aliases={"writer": "accounts"})) == {("accounts", "posts", "writer_id")}
+
+
+def test_aliases_are_part_of_the_relationships_cache_key(database, tmp_path):
+    cache = SchemaCache(str(tmp_path))
+    assert edges(analyze(database, cache=cache)) == set()
+    assert edges(analyze(database, cache=cache, aliases={"writer": "accounts"})) == {("accounts", "posts", "writer_id")}
+
+
+def test_cli_alias_option(database, monkeypatch):
+    args = build_parser().parse_args(["--alias", "writer=accounts", "--alias", "seller = users"])
+    assert parse_aliases(args.alias) == {**DEFAULT_ALIASES, "writer": "accounts", "seller": "users"}
+    assert parse_aliases(build_parser().parse_args([]).alias) is None
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["--alias", "writer"])
+
+    captured = {}
+    monkeypatch.setattr("sample_data.build_sample_database", lambda: database)
+    monkeypatch.setattr(Grafos, "generate_erd_graphviz_with_data_types", lambda db_data, output, **options: captured.update(options) or {"png": output})
+    assert Grafos.main(["--alias", "writer=accounts", "-q"]) == 0
+    assert captured["aliases"]["writer"] == "accounts"
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from async_pipeline import AsyncPipeline, FakeAsyncSource
+from profiling import profile_collection
+from sample_data import build_sample_database
+from synthetic import generate_database
+
+
+def run(pipeline, sources):
+    finished = []
+    results = asyncio.run(pipeline.run(sources, on_result=lambda result: finished.append(result.name)))
+    return results, finished
+
+
+class FailingSource(FakeAsyncSource):
+    async def documents(self, collection_name):
+        raise ConnectionError("servidor caído")
+        yield
+
+
+class CountingSource(FakeAsyncSource):
+    # Cuenta los cursores abiertos a la vez entre todas las instancias que comparten `counter`.
+    def __init__(self, db_data, counter, **kwargs):
+        super().__init__(db_data, **kwargs)
+        self.counter = counter
+
+    async def documents(self, collection_name):
+        self.counter["open"] += 1
+        self.counter["peak"] = max(self.counter["peak"], self.counter["open"])
+        try:
+            async for document in super().documents(collection_name):
+                yield document
+        finally:
+            self.counter["open"] -= 1
+
+
+def test_fast_tenant_is_not_held_back_by_a_slow_one():
+    data = build_sample_database()
+    sources = {"slow": FakeAsyncSource(data, latency=0.05, batch_size=1), "fast": FakeAsyncSource(data)}
+    results, finished = run(AsyncPipeline(), sources)
+    assert finished == ["fast", "slow"]
+    assert results["fast"].graph.edge_count == results["slow"].graph.edge_count > 0
+
+
+def test_failing_tenant_is_isolated():
+    data = build_sample_database()
+    results, finished = run(AsyncPipeline(), {"broken": FailingSource(data), "healthy": FakeAsyncSource(data)})
+    assert isinstance(results["broken"].error, ConnectionError)
+    assert results["broken"].graph is None
+    assert results["healthy"].error is None and results["healthy"].graph.edge_count > 0
+    assert sorted(finished) == ["broken", "healthy"]
+
+
+def test_max_collections_bounds_open_cursors():
+    data = generate_database(collections=6, documents=20, seed=3)
+    counter = {"open": 0, "peak": 0}
+    sources = {f"db{i}": CountingSource(data, counter, latency=0.001, batch_size=5) for i in range(3)}
+    results, _ = run(AsyncPipeline(max_databases=3, max_collections=4), sources)
+    assert all(result.error is None for result in results.values())
+    assert counter["peak"] == 4
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"mode": "value"},
+    {"sampling": "reservoir"},
+    {"sample_size": 30, "mode": "both"},
+])
+def test_batched_profiles_match_profile_collection(options):
+    data = generate_database(collections=3, documents=120, nesting_depth=1, seed=4)
+    pipeline = AsyncPipeline(profile_batch_size=7, **options)
+
+    async def profile_all():
+        slots = asyncio.Semaphore(2)
+        source = FakeAsyncSource(data, batch_size=11)
+        return [await pipeline._profile_collection(source, name, slots) for name in data]
+
+    profile_options = pipeline.profile_options
+    for name, batched in zip(data, asyncio.run(profile_all())):
+        expected = profile_collection(name, data[name], profile_options["sample_size"], profile_options["strategy"], None,
+                                      profile_options["with_values"], with_cardinality=profile_options["with_cardinality"],
+                                      max_depth=profile_options["max_depth"], max_width=profile_options["max_width"])
+        assert (batched.schema.sampled, batched.schema.seen) == (expected.schema.sampled, expected.schema.seen)
+        assert batched.schema.field_types == expected.schema.field_types
+        assert {field: stats.label("[]" in field) for field, stats in batched.field_cardinality.items()} == \
+            {field: stats.label("[]" in field) for field, stats in expected.field_cardinality.items()}
+        assert batched.reference_samples == expected.reference_samples
+        if expected.id_filter is not None:
+            assert len(batched.id_filter) == len(expected.id_filter)
@@ -0,0 +1,188 @@
+import logging
+import threading
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+from bson import ObjectId
+from mongomock import aggregate
+
+import mongo_loader
+from mongo_loader import CollectionSource, collection_sources, load_db_data, load_schemas, reference_projection
+from profiling import collect_profiles, profile_collection
+from sampling import CollectionSchema, document_signature
+
+DOCUMENTS = [
+    {"_id": ObjectId(), "name": "a", "address": {"city": "x", "zip": 1}, "tags": ["t", 2]},
+    {"_id": ObjectId(), "name": "b", "items": [{"product_id": ObjectId(), "qty": 1}], "score": 1.5},
+    {"_id": ObjectId(), "name": None, "address": {"city": "y", "geo": {"lat": 1.0}}},
+]
+
+
+@pytest.fixture
+def database():
+    database = mongomock.MongoClient().shop
+    database.orders.insert_many([dict(document) for document in DOCUMENTS])
+    database.users.insert_one({"_id": ObjectId(), "name": "u"})
+    database["system.views"].insert_one({"_id": 1})
+    return database
+
+
+@pytest.fixture
+def server_types(monkeypatch):
+    # mongomock no implementa $type en expresiones; se añade con los nombres del servidor para probar la ruta normal.
+    names = {dict: "object", list: "array", str: "string", int: "int", float: "double", type(None): "null", ObjectId: "objectId"}
+    handle_type_operator = aggregate._Parser._handle_type_operator
+
+    def handle(parser, operator, values):
+        if operator == "$type":
+            return names[type(parser.parse(values))]
+        return handle_type_operator(parser, operator, values)
+
+    monkeypatch.setattr(aggregate._Parser, "_handle_type_operator", handle)
+    monkeypatch.setattr(aggregate, "type_operators", aggregate.type_operators + ["$type"])
+
+
+def expected_schema(documents, max_depth=5, max_width=100):
+    schema = CollectionSchema()
+    for document in documents:
+        schema.add_signature(document_signature(document, max_depth, max_width))
+    return schema.field_types
+
+
+def test_load_schemas_types_on_server(database, server_types, caplog):
+    with caplog.at_level(logging.WARNING, logger="grafos.mongo_loader"):
+        db_data = load_schemas(database)
+    assert not caplog.records
+    assert list(db_data) == ["orders", "users"]
+    orders = db_data["orders"]
+    assert (orders.sampled, orders.seen) == (3, 3)
+    assert orders.field_types == expected_schema(DOCUMENTS)
+    assert orders.has_type("items[].product_id", "ObjectId")
+    assert orders.has_type("address.geo.lat", "float")
+
+
+def test_load_schemas_falls_back_to_client_typing(database, caplog):
+    with caplog.at_level(logging.WARNING, logger="grafos.mongo_loader"):
+        db_data = load_schemas(database, collection_names=["orders"])
+    assert "$type" in caplog.text
+    assert list(db_data) == ["orders"]
+    assert db_data["orders"].field_types == expected_schema(DOCUMENTS)
+
+
+@pytest.mark.parametrize("fallback", [False, True])
+def test_load_schemas_limits(database, request, fallback):
+    if not fallback:
+        request.getfixturevalue("server_types")
+    orders = load_schemas(database, sample_size=2, collection_names=["orders"], max_depth=1, max_width=3)["orders"]
+    assert (orders.sampled, orders.seen) == (2, 3)
+    assert orders.field_types == expected_schema(DOCUMENTS[:2], max_depth=1, max_width=3)
+    assert "address" in orders.field_types and "address.city" not in orders.field_types
+
+
+def test_load_db_data_closes_client(database, monkeypatch):
+    closed = []
+    monkeypatch.setattr(database.client, "close", lambda: closed.append(True))
+    monkeypatch.setattr(mongo_loader, "connect", lambda uri, max_pool_size: database.client)
+    db_data = load_db_data("mongodb://localhost", "shop", sample_size=1)
+    assert {name: schema.sampled for name, schema in db_data.items()} == {"orders": 1, "users": 1}
+    assert closed == [True]
+
+
+def test_reference_projection_skips_colliding_paths():
+    schema = CollectionSchema()
+    schema.add_signature((("_id", "ObjectId"), ("owner", "ObjectId"), ("items[]", "dict"), ("items[].product_id", "ObjectId"), ("name", "str")))
+    schema.add_signature((("owner", "dict"), ("owner.id", "ObjectId"), ("_id.shard", "ObjectId")))
+    assert reference_projection(schema) == {"_id": 1, "items.product_id": 1, "owner": 1}
+
+
+def _orders(count):
+    users = [ObjectId() for _ in range(count // 4)]
+    return [{"_id": ObjectId(), "user_id": users[i % len(users)], "coupon_id": ObjectId(), "note": "x" * i,
+             "items": [{"product_id": ObjectId(), "qty": i}]} for i in range(count)]
+
+
+@pytest.fixture
+def orders():
+    documents = _orders(40)
+    collection = mongomock.MongoClient().shop.orders
+    collection.insert_many([dict(document) for document in documents])
+    pipelines = []
+    aggregate = collection.aggregate
+
+    def spy(pipeline, **kwargs):
+        pipelines.append(pipeline)
+        return aggregate(pipeline, **kwargs)
+
+    collection.aggregate = spy
+    return CollectionSource(collection), documents, pipelines
+
+
+def test_profile_samples_schema_and_cardinality_on_server(orders):
+    source, documents, pipelines = orders
+    profile = source.profile("orders", 10, with_cardinality=True)
+    assert (profile.schema.sampled, profile.schema.seen) == (10, 40)
+    assert profile.schema.field_types == expected_schema(documents[:10])
+    # Segunda muestra para la cardinalidad: mismos sample_size documentos, proyectados a _id y las referencias.
+    assert pipelines[-1] == [{"$limit": 10}, {"$project": {"_id": 1, "coupon_id": 1, "items.product_id": 1, "user_id": 1}}]
+    cardinality = profile.field_cardinality
+    assert {field: stats.count for field, stats in cardinality.items()} == {"user_id": 10, "coupon_id": 10, "items[].product_id": 10}
+    # Una muestra parcial no demuestra unicidad: sin repeticiones vistas la etiqueta sigue siendo 1:N.
+    assert cardinality["coupon_id"].label() == "1:N"
+    assert not profile.has_values
+
+
+def test_profile_marks_a_sample_covering_the_collection_as_complete(orders):
+    source, _, _ = orders
+    cardinality = source.profile("orders", 100, with_cardinality=True).field_cardinality
+    assert cardinality["coupon_id"].label() == "1:1"
+    assert cardinality["user_id"].label() == "1:N"
+    assert cardinality["items[].product_id"].label(multi_valued=True) == "N:1"
+
+
+def test_profile_value_mode_scans_projected_references(orders, monkeypatch):
+    source, documents, _ = orders
+    projections = []
+    find = source.collection.find
+
+    def spy(*args, **kwargs):
+        # mongomock también llama a find() sin argumentos desde aggregate(): solo cuentan las llamadas con proyección.
+        if len(args) > 1:
+            projections.append(args[1])
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(source.collection, "find", spy)
+    profile = source.profile("orders", 5, with_values=True, with_cardinality=True, id_filter_kind="sorted")
+    assert projections == [{"_id": 1, "coupon_id": 1, "items.product_id": 1, "user_id": 1}]
+    assert all(document["_id"].binary in profile.id_filter for document in documents)
+    assert sorted(profile.reference_samples) == ["coupon_id", "items[].product_id", "user_id"]
+    # El recorrido por valores es completo: la cardinalidad sale de los 40 documentos.
+    assert profile.field_cardinality["user_id"].count == 40
+    assert profile.field_cardinality["coupon_id"].label() == "1:1"
+
+
+def test_profile_matches_in_memory_profiling(orders):
+    source, documents, _ = orders
+    for options in ({"with_cardinality": True}, {"with_values": True, "with_cardinality": True}, {"with_stats": True}):
+        live = source.profile("orders", 40, **options)
+        memory = profile_collection("orders", documents, 40, **options)
+        assert live.schema.field_types == memory.schema.field_types
+        assert sorted(live.field_cardinality or ()) == sorted(memory.field_cardinality or ())
+        for field, stats in (memory.field_cardinality or {}).items():
+            assert live.field_cardinality[field].label("[]" in field) == stats.label("[]" in field)
+        if memory.field_stats is not None:
+            assert live.field_stats.to_dict() == memory.field_stats.to_dict()
+
+
+def test_live_sources_are_profiled_concurrently_by_default(database, monkeypatch):
+    threads = set()
+    profile = CollectionSource.profile
+
+    def spy(source, *args, **kwargs):
+        threads.add(threading.current_thread().name)
+        return profile(source, *args, **kwargs)
+
+    monkeypatch.setattr(CollectionSource, "profile", spy)
+    profiles = collect_profiles(collection_sources(database))
+    assert sorted(profiles) == ["orders", "users"]
+    assert threading.main_thread().name not in threads